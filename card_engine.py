@@ -0,0 +1,301 @@
+# card_engine.py
+# 가상카드 결제 승인 엔진 (Streamlit 없이 import 해서 사용)
+# trial24.py 의 "결제 시도" 버튼 블록에 있던 승인 로직을 분리한 것.
+# UI, 테스트, CLI 모두 같은 authorize() 를 호출한다.
+
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from card_ids import IdAllocator
+from card_store import ActiveCardIndex, CardStore, MemoryCardStore
+from expiry_wheel import TimingWheel
+from idempotency import IdempotencyCache
+from ledger import Ledger
+from models import normalize_country
+from risk import REASONS_LIST, DeterministicRisk, calculate_risk
+from site_policy import intern_sites
+from transactions import make_transaction
+from velocity import describe as describe_velocity
+
+# ------------------- 결정 상태 -------------------
+APPROVED = 'approved'   # 즉시 승인
+PENDING = 'pending'     # 본인인증 필요
+DECLINED = 'declined'   # 거절
+
+Decision = namedtuple(
+    'Decision',
+    ['status', 'card_id', 'amount', 'site', 'country', 'risk_score', 'reasons', 'message', 'reservation'],
+    defaults=(None,),   # reservation: 본인인증 대기 중인 결제가 점유한 카드 토큰
+)
+
+RISK_APPROVE_THRESHOLD = 0.4
+HIGH_RISK_COUNTRIES = ('NG', 'RU')
+
+# ------------------- 유틸 함수 -------------------
+def encode_reasons(reasons):
+    mask = 0
+    for reason in reasons:
+        mask |= 1 << REASONS_LIST.index(reason)
+    return mask
+
+def decode_reasons(mask):
+    return [reason for i, reason in enumerate(REASONS_LIST) if mask & (1 << i)]
+
+def parse_allowed_sites(text):
+    return [s.strip() for s in text.split('\n') if s.strip()]
+
+# ------------------- 승인 엔진 -------------------
+class AuthEngine:
+    def __init__(self, store=None, transactions_db=None, risk_fn=calculate_risk, ledger=None, id_key=0,
+                 features=None, velocity=None, idempotency=None, recommender=None):
+        # store 는 CardStore(SQLite) 또는 MemoryCardStore
+        self.store = store if store is not None else MemoryCardStore()
+        self.ids = IdAllocator(self.store, key=id_key)
+        # ledger(바이너리 원장)가 있으면 메모리 거래 목록은 따로 넘길 때만 유지
+        self.ledger = ledger
+        if transactions_db is None and ledger is None:
+            transactions_db = []
+        self.transactions_db = transactions_db
+        self.risk_fn = risk_fn
+        # feature_store.FeatureStore: 거래 기록 시 갱신, risk_fn.uses_features 가 참이면 점수 계산에 전달
+        self.features = features
+        # velocity.VelocityLimiter: 위험 점수 계산 전에 결제 빈도 확인
+        self.velocity = velocity
+        # 멱등 키 -> 처음 결정 (같은 키로 다시 들어온 요청은 점수 계산/기록 없이 저장된 결정 반환)
+        self.idempotency = idempotency if idempotency is not None else IdempotencyCache()
+        # recommend.Recommender: 발급/결제 때 목적별 집계 갱신 (발급 조건 추천용)
+        self.recommender = recommender
+        # 유효기간이 지난 카드를 자동 폐기하는 만료 휠과 사용 가능 카드 색인 (저장소에 남아 있는 사용 가능 카드로 채움)
+        self.expiry = TimingWheel()
+        self.active = ActiveCardIndex()
+        for card_id, expiry in self.store.active_expiries():
+            self.expiry.schedule(card_id, expiry)
+            self.active.add(card_id)
+
+    def _new_card(self, purpose, limit, duration_days, allowed_sites):
+        return {
+            "purpose": purpose,
+            "limit": int(limit),
+            "expiry": datetime.now() + timedelta(days=int(duration_days)),
+            "restricted": bool(allowed_sites),
+            "allowed_sites": allowed_sites or None,
+            "active": True,
+        }
+
+    def issue_card(self, purpose, limit, duration_days, allowed_sites=None):
+        # 허용 사이트 목록은 발급 시점에 정책 하나로 정규화 (같은 목록의 카드는 트라이를 공유)
+        allowed_sites = intern_sites(allowed_sites)
+        card = self._new_card(purpose, limit, duration_days, allowed_sites)
+        while True:
+            card_id = self.ids.allocate()
+            try:
+                self.store.add(card_id, card)
+                self.expiry.schedule(card_id, card['expiry'].timestamp())
+                self.active.add(card_id)
+                if self.recommender is not None:
+                    self.recommender.record_card(purpose, duration_days, bool(allowed_sites))
+                return card_id
+            except KeyError:
+                # 할당기 도입 이전에 무작위로 발급된 번호와 겹치면 다음 번호 사용
+                continue
+
+    def issue_cards(self, count, purpose, limit, duration_days, allowed_sites=None):
+        # 대량 발급: 번호를 한 번에 할당하고 저장소에 일괄 추가
+        allowed_sites = intern_sites(allowed_sites)
+        card_ids = self.ids.allocate_many(count)
+        cards = [(card_id, self._new_card(purpose, limit, duration_days, allowed_sites)) for card_id in card_ids]
+        self.store.add_many(cards)
+        for card_id, card in cards:
+            self.expiry.schedule(card_id, card['expiry'].timestamp())
+        self.active.add_many(card_ids)
+        if self.recommender is not None:
+            self.recommender.record_card(purpose, duration_days, bool(allowed_sites), count)
+        return card_ids
+
+    def expire_cards(self, now=None):
+        # 유효기간이 지난 카드를 비활성화하고 그 번호 목록을 돌려준다 (시간이 흐른 만큼만 처리)
+        expired = self.expiry.advance(now)
+        if expired:
+            self.store.retire(expired)
+            self.active.discard_many(expired)
+        return expired
+
+    def authorize(self, card_id, amount, site, country, idempotency_key=None):
+        if idempotency_key is None:
+            return self._authorize(card_id, amount, site, country)
+        return self.idempotency.run(idempotency_key,
+                                    lambda: self._authorize(card_id, amount, site, country))
+
+    def _authorize(self, card_id, amount, site, country):
+        # 국가는 원장/집계/점수 계산 모두 2글자 코드로 쓰므로, 올바르지 않은 입력은 아무것도 점유하기 전에 거절
+        code = normalize_country(country)
+        if code is None:
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "국가 코드가 올바르지 않습니다. 영문 2글자로 입력해주세요. (예: KR)")
+        country = code
+        self.expire_cards()
+        # 0. 사용 가능 카드 색인은 이 프로세스가 본 카드만 안다. 색인에 없는 카드는 다른 프로세스가 같은 저장소에
+        #    발급했을 수 있으므로 저장소를 확인해, 쓸 수 있는 카드면 색인과 만료 휠에 넣고 계속 진행한다
+        card = self.store.get(card_id)
+        if card is None:
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "존재하지 않는 카드입니다.")
+        if not card['active']:
+            # 다른 프로세스가 쓰거나 폐기한 카드도 색인에서 뺀다
+            self.active.discard(card_id)
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "이미 사용되었거나 폐기된 카드입니다.")
+        if card_id not in self.active and card['expiry'] > datetime.now():
+            self.expiry.schedule(card_id, card['expiry'].timestamp())
+            self.active.add(card_id)
+
+        # 1. 카드 한도 초과 체크
+        if amount > card['limit']:
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "결제 금액이 카드 한도를 초과했습니다. 결제를 보류합니다.")
+
+        # 2. 유효기간 체크
+        if card['expiry'] < datetime.now():
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "카드 유효기간이 만료되었습니다.")
+
+        # 3. 사용처 제한 체크 (즉시 거절)
+        if card['restricted'] and card.get('allowed_sites') and site not in card['allowed_sites']:
+            return Decision(DECLINED, card_id, amount, site, country, None, [],
+                            "사용처 제한 위반! 결제가 거부되었습니다.")
+
+        # 4. 결제 빈도 체크 (카드/사이트/국가별 1분, 1시간, 24시간)
+        if self.velocity is not None:
+            violation = self.velocity.hit(card_id, site, country, amount)
+            if violation is not None:
+                return Decision(DECLINED, card_id, amount, site, country, None, [],
+                                f"{describe_velocity(violation)}! 결제가 거부되었습니다.")
+
+        # 5. 위험 점수 계산 (고위험 국가는 점수와 관계없이 본인인증)
+        if self.features is not None and getattr(self.risk_fn, 'uses_features', False):
+            risk_score, reasons = self.risk_fn(amount, card, site, country,
+                                               features=self.features.lookup(card_id, site, country))
+        else:
+            risk_score, reasons = self.risk_fn(amount, card, site, country)
+        if country in HIGH_RISK_COUNTRIES:
+            if '고위험 국가 결제' not in reasons:
+                reasons = reasons + ['고위험 국가 결제']
+            status = PENDING
+        else:
+            status = APPROVED if risk_score <= RISK_APPROVE_THRESHOLD else PENDING
+
+        # 6. 카드 점유 (사용 여부/한도 확인과 점유를 원자적으로 - 동시 결제 중 하나만 통과)
+        token = self.store.reserve(card_id, amount)
+        if token is None:
+            return Decision(DECLINED, card_id, amount, site, country, risk_score, reasons,
+                            "이미 사용되었거나 다른 결제가 진행 중인 카드입니다.")
+        if self.recommender is not None:
+            self.recommender.record_attempt(card['purpose'], amount, status == PENDING)
+
+        if status == APPROVED:
+            decision = Decision(APPROVED, card_id, amount, site, country, risk_score, reasons,
+                                "결제 승인 완료.")
+            if not self._commit_and_record(decision, token):
+                return decision._replace(status=DECLINED, message="이미 사용되었거나 폐기된 카드입니다.")
+            return decision
+
+        return Decision(PENDING, card_id, amount, site, country, risk_score, reasons,
+                        "위험 점수가 높습니다. 결제를 계속 진행하려면 본인인증이 필요합니다.", token)
+
+    def confirm(self, decision, idempotency_key=None):
+        if idempotency_key is None:
+            return self._confirm(decision)
+        return self.idempotency.run(idempotency_key, lambda: self._confirm(decision))
+
+    def _confirm(self, decision):
+        # 본인인증 완료 후 보류된 결제를 승인
+        # (점유 시간이 지나 다른 결제가 가져갔거나, 기다리는 동안 카드가 만료돼 폐기됐으면 거절)
+        self.expire_cards()
+        approved = decision._replace(status=APPROVED, reservation=None, message="결제 승인 완료.")
+        if not self._commit_and_record(approved, decision.reservation):
+            if decision.card_id not in self.active:
+                return decision._replace(status=DECLINED, reservation=None,
+                                         message="카드 유효 기간이 지나 결제가 취소되었습니다.")
+            return decision._replace(status=DECLINED, reservation=None,
+                                     message="본인인증 대기 시간이 지나 결제가 취소되었습니다.")
+        return approved
+
+    def cancel(self, decision, idempotency_key=None):
+        # 보류된 결제 취소: 카드 점유 해제
+        # 결제 요청의 멱등 키를 주면 저장된 보류 결정도 지워서, 같은 키로 다시 요청해도 풀린 점유를 재사용하지 않는다
+        self.store.release(decision.card_id, decision.reservation)
+        if idempotency_key is not None:
+            self.idempotency.discard(idempotency_key)
+        return decision._replace(status=DECLINED, reservation=None, message="결제가 취소되었습니다.")
+
+    def _commit_and_record(self, decision, token):
+        # 점유한 카드를 확정하고 승인 결제를 기록한다. 점유를 잃었으면 아무것도 기록하지 않고 False
+        # 기록할 레코드/거래는 확정 전에 만들어 두므로, 인코딩 오류로 카드만 쓰이고 기록이 빠지는 일은 없다
+        record = None
+        if self.ledger is not None:
+            record = self.ledger.pack(decision.card_id, decision.amount, decision.site, decision.country,
+                                      decision.risk_score, encode_reasons(decision.reasons))
+        transaction = None
+        if self.transactions_db is not None:
+            transaction = make_transaction(decision.card_id, decision.amount, decision.site, decision.country,
+                                           decision.risk_score, decision.reasons)
+        if not self.store.commit(decision.card_id, token):
+            return False
+        self.active.discard(decision.card_id)
+        if record is not None:
+            self.ledger.write(record)
+        if transaction is not None:
+            self.transactions_db.append(transaction)
+        if self.features is not None:
+            self.features.update(decision.card_id, decision.amount, decision.site, decision.country)
+        return True
+
+# 모듈 단위 기본 엔진 (테스트/CLI 에서 바로 authorize() 호출용)
+default_engine = AuthEngine()
+
+def authorize(card_id, amount, site, country, idempotency_key=None):
+    return default_engine.authorize(card_id, amount, site, country, idempotency_key)
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="가상카드 승인 엔진 부하 테스트")
+    parser.add_argument("-n", "--count", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--amount", type=int, default=80)
+    parser.add_argument("--site", default="amazon.com")
+    parser.add_argument("--country", default="KR")
+    parser.add_argument("--db", help="SQLite 카드 저장소 경로 (생략 시 메모리 저장소)")
+    parser.add_argument("--ledger", help="바이너리 거래 원장 경로 (생략 시 메모리 거래 목록)")
+    parser.add_argument("--seed", type=int, help="결정적 위험 점수 시드 (재현 가능한 벤치마크)")
+    parser.add_argument("--model", nargs='?', const='', help="위험 모델 파일 (값 없이 주면 기본 모델)")
+    args = parser.parse_args(argv)
+
+    risk_fn = calculate_risk
+    if args.model is not None:
+        from risk_model import load_model
+
+        risk_fn = load_model(args.model)
+    elif args.seed is not None:
+        risk_fn = DeterministicRisk(args.seed)
+
+    engine = AuthEngine(CardStore(args.db) if args.db else None,
+                        ledger=Ledger(args.ledger) if args.ledger else None,
+                        risk_fn=risk_fn)
+    # 일회용 카드이므로 결제마다 새 카드
+    card_ids = engine.issue_cards(args.count, "부하 테스트", args.limit, 7, ["amazon.com", "kbstar.com", "temu.com"])
+
+    counts = {APPROVED: 0, PENDING: 0, DECLINED: 0}
+    start = time.perf_counter()
+    for card_id in card_ids:
+        counts[engine.authorize(card_id, args.amount, args.site, args.country).status] += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.count}건 처리, {elapsed:.3f}초 ({args.count / elapsed:,.0f}건/초)")
+    for status, n in counts.items():
+        print(f"  {status}: {n}")
+
+if __name__ == "__main__":
+    main()
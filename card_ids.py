@@ -0,0 +1,71 @@
+# card_ids.py
+# 충돌 없는 카드 번호 할당기
+# 카드 번호 형식(CARD###-XXX)은 그대로 두고, 저장소에서 예약한 순번 블록을 Feistel 순열로 섞어
+# 무작위처럼 보이지만 절대 겹치지 않는 번호를 만든다.
+#  - 순번은 저장소의 reserve_ids(n) 로 블록 단위 예약 (여러 워커 프로세스도 블록마다 한 번만 동기화)
+#  - 순열은 전단사이므로 서로 다른 순번 -> 서로 다른 카드 번호
+#  - 같은 key 를 쓰는 모든 워커가 같은 순열을 공유해야 한다
+
+import string
+import threading
+
+NUM_SPACE = 1000                  # 숫자 3자리
+ALPHA_SPACE = 26 ** 3             # 대문자 3자리
+ID_SPACE = NUM_SPACE * ALPHA_SPACE
+
+ROUNDS = 4                        # 짝수여야 (숫자, 문자) 자리 크기가 원래대로 돌아온다
+
+def _round(value, key, i):
+    x = (value ^ key ^ (i * 0x9E3779B1)) & 0xFFFFFFFF
+    x = (x * 0x45D9F3B) & 0xFFFFFFFF
+    return x ^ (x >> 16)
+
+def permute(seq, key=0):
+    # [0, ID_SPACE) 위의 순열: 크기가 다른 두 반쪽(1000 x 26^3)에 모듈러 덧셈 Feistel 을 적용
+    if not 0 <= seq < ID_SPACE:
+        raise ValueError(f"카드 번호 공간을 벗어난 순번입니다: {seq}")
+    left, right = divmod(seq, ALPHA_SPACE)
+    left_size, right_size = NUM_SPACE, ALPHA_SPACE
+    for i in range(ROUNDS):
+        left, right = right, (left + _round(right, key, i)) % left_size
+        left_size, right_size = right_size, left_size
+    return left * ALPHA_SPACE + right
+
+def format_card_id(index):
+    num, alpha = divmod(index, ALPHA_SPACE)
+    letters = ''
+    for _ in range(3):
+        alpha, r = divmod(alpha, 26)
+        letters = string.ascii_uppercase[r] + letters
+    return f"CARD{num:03d}-{letters}"
+
+class IdAllocator:
+    def __init__(self, source, key=0, block_size=1024):
+        # source: reserve_ids(count) -> 시작 순번 을 제공하는 카드 저장소
+        self.source = source
+        self.key = key
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _take(self, count):
+        # 현재 블록에서 최대 count 개의 순번 구간을 꺼낸다
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self.source.reserve_ids(max(self.block_size, count))
+                self._end = self._next + max(self.block_size, count)
+            start = self._next
+            self._next = min(self._end, start + count)
+            return start, self._next
+
+    def allocate(self):
+        start, _ = self._take(1)
+        return format_card_id(permute(start, self.key))
+
+    def allocate_many(self, count):
+        ids = []
+        while len(ids) < count:
+            start, stop = self._take(count - len(ids))
+            ids.extend(format_card_id(permute(seq, self.key)) for seq in range(start, stop))
+        return ids
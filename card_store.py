@@ -0,0 +1,400 @@
+# card_store.py
+# 카드 저장소: SQLite(WAL) 기반 영구 저장소와 테스트용 메모리 저장소
+# 두 저장소는 같은 API(add / get / set_active / retire / card_ids)를 제공하고,
+# get() 은 기존 cards_db 값과 같은 모양의 dict 를 돌려준다.
+#
+# 결제 승인은 reserve -> commit / release 로 카드를 원자적으로 점유한다.
+# 한도/사용 여부 확인과 점유가 한 번에 일어나므로, 같은 카드에 동시에 들어온 두 결제 중 하나만 통과한다.
+#   SQLite: 조건부 UPDATE (reserved_token 비교 후 교체, version 증가) - 프로세스 간에도 원자적
+#   메모리: 카드 번호 해시로 고른 줄무늬(stripe) 락 하나만 잡으므로 다른 카드의 승인은 막지 않는다
+
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+
+from site_policy import intern_sites, policies
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    card_id       TEXT PRIMARY KEY,
+    purpose       TEXT NOT NULL,
+    card_limit    INTEGER NOT NULL,
+    expiry        REAL NOT NULL,
+    restricted    INTEGER NOT NULL,
+    allowed_sites TEXT,                     -- 정책 테이블 도입 이전에 발급된 카드만 사용
+    active        INTEGER NOT NULL DEFAULT 1,
+    policy_id     INTEGER REFERENCES policies(policy_id),
+    version       INTEGER NOT NULL DEFAULT 0,
+    reserved_token TEXT,
+    reserved_at   REAL
+);
+CREATE TABLE IF NOT EXISTS policies (
+    policy_id INTEGER PRIMARY KEY,
+    sites     TEXT NOT NULL UNIQUE          -- 정규화/정렬한 패턴을 줄바꿈으로 연결
+);
+CREATE INDEX IF NOT EXISTS idx_cards_active ON cards(active);
+CREATE INDEX IF NOT EXISTS idx_cards_expiry ON cards(expiry);
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+"""
+
+CARD_COLUMNS = "card_id, purpose, card_limit, expiry, restricted, allowed_sites, active, policy_id"
+
+# 이전 버전 DB 파일에 없을 수 있는 열
+ADDED_COLUMNS = [
+    ("policy_id", "INTEGER REFERENCES policies(policy_id)"),
+    ("version", "INTEGER NOT NULL DEFAULT 0"),
+    ("reserved_token", "TEXT"),
+    ("reserved_at", "REAL"),
+]
+
+# 본인인증 대기 등으로 점유한 카드를 이 시간(초)이 지나면 다른 결제가 다시 점유할 수 있다
+RESERVATION_TTL = 600
+
+def _card_row(card_id, card, policy_id):
+    return (
+        card_id,
+        card['purpose'],
+        int(card['limit']),
+        card['expiry'].timestamp(),
+        int(bool(card['restricted'])),
+        None,
+        int(bool(card.get('active', True))),
+        policy_id,
+    )
+
+@lru_cache(maxsize=4096)
+def _legacy_sites(text):
+    return intern_sites(text.split('\n'))
+
+# ------------------- SQLite 저장소 -------------------
+class CardStore:
+    def __init__(self, path="cards.db"):
+        self.path = path
+        # Streamlit 은 요청마다 다른 스레드에서 스크립트를 실행하므로 연결을 공유하고 락으로 직렬화
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cards)")]
+            for name, ddl in ADDED_COLUMNS:
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE cards ADD COLUMN {name} {ddl}")
+        # 프로세스 공용 정책 번호(site_policy.policies) <-> DB 정책 번호
+        self._db_policy_ids = {}
+        self._policy_tries = {}
+        # 조회 전용 연결 풀: WAL 에서는 읽기가 쓰기/다른 읽기를 기다리지 않으므로 쓰기 락 밖에서 조회한다
+        self._readers = queue.SimpleQueue()
+
+    @contextmanager
+    def _reading(self):
+        if self.path == ':memory:':
+            # 메모리 DB 는 연결마다 따로이므로 쓰기 연결을 같이 쓴다
+            with self._lock:
+                yield self._conn
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    # ------------------- 정책 매핑 (_policy_id 는 쓰기 락을 잡은 상태에서 호출) -------------------
+    def _policy_id(self, allowed):
+        if not allowed:
+            return None
+        shared_id = policies.intern(allowed)
+        db_id = self._db_policy_ids.get(shared_id)
+        if db_id is None:
+            sites = '\n'.join(policies.trie(shared_id))
+            self._conn.execute("INSERT OR IGNORE INTO policies (sites) VALUES (?)", (sites,))
+            db_id = self._conn.execute("SELECT policy_id FROM policies WHERE sites = ?", (sites,)).fetchone()[0]
+            self._db_policy_ids[shared_id] = db_id
+            self._policy_tries[db_id] = policies.trie(shared_id)
+        return db_id
+
+    def _sites(self, db_id, conn):
+        trie = self._policy_tries.get(db_id)
+        if trie is None:
+            sites = conn.execute("SELECT sites FROM policies WHERE policy_id = ?", (db_id,)).fetchone()[0]
+            trie = self._policy_tries[db_id] = intern_sites(sites.split('\n'))
+            self._db_policy_ids[trie.policy_id] = db_id
+        return trie
+
+    def _from_row(self, row, conn):
+        _, purpose, limit, expiry, restricted, legacy_sites, active, policy_id = row
+        if policy_id is not None:
+            allowed = self._sites(policy_id, conn)
+        else:
+            allowed = _legacy_sites(legacy_sites) if legacy_sites else None
+        return {
+            "purpose": purpose,
+            "limit": limit,
+            "expiry": datetime.fromtimestamp(expiry),
+            "restricted": bool(restricted),
+            "allowed_sites": allowed,
+            "active": bool(active),
+        }
+
+    def add(self, card_id, card):
+        with self._lock:
+            try:
+                row = _card_row(card_id, card, self._policy_id(card.get('allowed_sites')))
+                self._conn.execute(f"INSERT INTO cards ({CARD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            except sqlite3.IntegrityError:
+                raise KeyError(f"이미 존재하는 카드입니다: {card_id}") from None
+
+    def add_many(self, items):
+        # 대량 발급은 한 트랜잭션으로 묶는다
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                rows = [_card_row(card_id, card, self._policy_id(card.get('allowed_sites')))
+                        for card_id, card in items]
+                self._conn.executemany(f"INSERT INTO cards ({CARD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def reserve_ids(self, count, name='card_id'):
+        # 카드 번호 순번 블록 예약. BEGIN IMMEDIATE 로 다른 프로세스와도 겹치지 않는다
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT next FROM sequences WHERE name = ?", (name,)).fetchone()
+                start = row[0] if row else 0
+                self._conn.execute("INSERT OR REPLACE INTO sequences VALUES (?, ?)", (name, start + count))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return start
+
+    def get(self, card_id):
+        with self._reading() as conn:
+            row = conn.execute(f"SELECT {CARD_COLUMNS} FROM cards WHERE card_id = ?", (card_id,)).fetchone()
+            return self._from_row(row, conn) if row else None
+
+    def set_active(self, card_id, active):
+        with self._lock:
+            self._conn.execute("UPDATE cards SET active = ? WHERE card_id = ?", (int(bool(active)), card_id))
+
+    def retire(self, card_ids):
+        # 만료된 카드 일괄 비활성화 (한 트랜잭션)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("UPDATE cards SET active = 0 WHERE card_id = ?", ((c,) for c in card_ids))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def active_expiries(self):
+        # (card_id, 만료 epoch 초) - 시작 시 만료 휠을 채울 때 사용
+        with self._reading() as conn:
+            return conn.execute("SELECT card_id, expiry FROM cards WHERE active = 1").fetchall()
+
+    # ------------------- 원자적 점유 -------------------
+    def reserve(self, card_id, amount):
+        # 사용 가능하고 한도 안이며 점유되지 않은 카드면 점유 토큰, 아니면 None
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE cards SET reserved_token = ?, reserved_at = ?, version = version + 1 "
+                "WHERE card_id = ? AND active = 1 AND card_limit >= ? "
+                "AND (reserved_token IS NULL OR reserved_at < ?)",
+                (token, now, card_id, amount, now - RESERVATION_TTL),
+            )
+        return token if cursor.rowcount == 1 else None
+
+    def commit(self, card_id, token):
+        # 점유한 결제를 확정하고 일회용 카드를 비활성화. 점유를 잃었거나 그 사이 폐기(만료)됐으면 False
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE cards SET active = 0, reserved_token = NULL, reserved_at = NULL, version = version + 1 "
+                "WHERE card_id = ? AND reserved_token = ? AND active = 1",
+                (card_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, card_id, token):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE cards SET reserved_token = NULL, reserved_at = NULL, version = version + 1 "
+                "WHERE card_id = ? AND reserved_token = ?",
+                (card_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def card_ids(self, active_only=False):
+        sql = "SELECT card_id FROM cards"
+        if active_only:
+            sql += " WHERE active = 1"
+        with self._reading() as conn:
+            return [row[0] for row in conn.execute(sql)]
+
+    def __contains__(self, card_id):
+        with self._reading() as conn:
+            return conn.execute("SELECT 1 FROM cards WHERE card_id = ?", (card_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self._reading() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+# ------------------- 메모리 저장소 -------------------
+class StripedReservations:
+    # 메모리 저장소용 점유 표. 카드마다 락을 만들지 않고 고정 개수의 락을 카드 번호 해시로 나눠 쓴다
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._held = {}     # card_id -> (token, reserved_at)
+
+    def _lock_for(self, card_id):
+        return self._locks[hash(card_id) % len(self._locks)]
+
+    def reserve(self, card_id, amount, get_card):
+        now = time.time()
+        with self._lock_for(card_id):
+            card = get_card(card_id)
+            if card is None or not card['active'] or amount > card['limit']:
+                return None
+            held = self._held.get(card_id)
+            if held is not None and now - held[1] < RESERVATION_TTL:
+                return None
+            token = uuid.uuid4().hex
+            self._held[card_id] = (token, now)
+            return token
+
+    def finish(self, card_id, token, on_commit=None, get_card=None):
+        # get_card 를 주면 (확정할 때) 점유 중에 폐기된 카드는 점유만 풀고 False
+        with self._lock_for(card_id):
+            held = self._held.get(card_id)
+            if held is None or held[0] != token:
+                return False
+            del self._held[card_id]
+            if get_card is not None:
+                card = get_card(card_id)
+                if card is None or not card['active']:
+                    return False
+            if on_commit is not None:
+                on_commit(card_id)
+            return True
+
+class MemoryCardStore:
+    def __init__(self, cards_db=None):
+        self.cards_db = cards_db if cards_db is not None else {}
+        self._next_seq = 0
+        self._reservations = StripedReservations()
+
+    def add(self, card_id, card):
+        if card_id in self.cards_db:
+            raise KeyError(f"이미 존재하는 카드입니다: {card_id}")
+        self.cards_db[card_id] = card
+
+    def add_many(self, items):
+        for card_id, card in items:
+            self.add(card_id, card)
+
+    def reserve_ids(self, count):
+        start = self._next_seq
+        self._next_seq += count
+        return start
+
+    def get(self, card_id):
+        return self.cards_db.get(card_id)
+
+    def set_active(self, card_id, active):
+        self.cards_db[card_id]['active'] = bool(active)
+
+    def retire(self, card_ids):
+        for card_id in card_ids:
+            self.set_active(card_id, False)
+
+    def active_expiries(self):
+        return [(card_id, card['expiry'].timestamp()) for card_id, card in self.cards_db.items()
+                if card.get('active', True)]
+
+    def reserve(self, card_id, amount):
+        return self._reservations.reserve(card_id, amount, self.cards_db.get)
+
+    def commit(self, card_id, token):
+        return self._reservations.finish(card_id, token, lambda card_id: self.set_active(card_id, False),
+                                         self.cards_db.get)
+
+    def release(self, card_id, token):
+        return self._reservations.finish(card_id, token)
+
+    def card_ids(self, active_only=False):
+        if active_only:
+            return [card_id for card_id, card in self.cards_db.items() if card['active']]
+        return list(self.cards_db.keys())
+
+    def __contains__(self, card_id):
+        return card_id in self.cards_db
+
+    def __len__(self):
+        return len(self.cards_db)
+
+    def close(self):
+        pass
+
+# ------------------- 사용 가능 카드 색인 -------------------
+class ActiveCardIndex:
+    # 아직 쓰지 않았고 만료되지 않은 카드 번호 (발급 순서 유지)
+    # 발급 / 승인 / 만료 때 엔진이 갱신하고, 카드 선택 목록은 저장소 대신 이 색인을 본다
+    # 프로세스마다 따로 있으므로 승인 경로는 색인에 없는 카드도 저장소에서 확인한다 (다른 프로세스가 발급한 카드)
+    def __init__(self, card_ids=()):
+        self._ids = dict.fromkeys(card_ids)
+        self._lock = threading.Lock()
+
+    def add(self, card_id):
+        with self._lock:
+            self._ids[card_id] = None
+
+    def add_many(self, card_ids):
+        with self._lock:
+            self._ids.update(dict.fromkeys(card_ids))
+
+    def discard(self, card_id):
+        with self._lock:
+            self._ids.pop(card_id, None)
+
+    def discard_many(self, card_ids):
+        with self._lock:
+            for card_id in card_ids:
+                self._ids.pop(card_id, None)
+
+    def recent(self, limit):
+        # 최근 발급된 카드부터 limit 장
+        with self._lock:
+            return list(islice(reversed(self._ids), limit))
+
+    def __contains__(self, card_id):
+        return card_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
@@ -0,0 +1,84 @@
+# expiry_wheel.py
+# 카드 유효기간 자동 폐기용 계층형 타이밍 휠
+# 만료 시각을 TICK_SECONDS 단위 틱으로 바꿔 단계(level)별 64칸 휠에 넣는다.
+#   단계 0: 1틱 칸 64개 (약 1시간), 단계 1: 64틱 칸 64개 (약 2.8일), 단계 2: 4096틱 칸 64개 (약 6개월) ...
+# 시간이 흐르면 단계 0 칸을 하나씩 비우고, 윗 단계 칸의 경계에 닿을 때만 그 칸을 아래 단계로 내려보낸다.
+# 카드 한 장은 단계 수만큼만 옮겨지므로 등록/폐기 모두 분할 상환 O(1) 이고, 전체 카드를 훑지 않는다.
+# 등록 취소는 없다: 이미 사용된 카드가 만료 시각에 다시 나와도 비활성화는 멱등이므로 그대로 둔다.
+
+import math
+import threading
+import time
+
+TICK_SECONDS = 60
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 4          # 64^4 틱 = 약 32년, 그 너머는 _far 에 두었다가 최상위 휠이 한 바퀴 돌 때 다시 배치
+
+class TimingWheel:
+    def __init__(self, tick_seconds=TICK_SECONDS, now=None):
+        now = time.time() if now is None else now
+        self.tick_seconds = tick_seconds
+        self.current = int(now // tick_seconds)     # 마지막으로 처리한 틱
+        self._slots = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._far = []
+        self._due = []      # 등록 시점에 이미 만료된 항목
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _place(self, key, tick):
+        if tick <= self.current:
+            self._due.append(key)
+            return
+        # tick 과 현재 틱이 같은 (level + 1) 단계 칸에 있는 가장 낮은 단계에 넣는다
+        for level in range(LEVELS):
+            if tick >> (SLOT_BITS * (level + 1)) == self.current >> (SLOT_BITS * (level + 1)):
+                self._slots[level][(tick >> (SLOT_BITS * level)) & (SLOTS - 1)].append((key, tick))
+                return
+        self._far.append((key, tick))
+
+    def schedule(self, key, expiry):
+        # expiry: epoch 초. 만료 시각이 속한 틱이 끝난 뒤에 폐기된다
+        with self._lock:
+            self._place(key, math.ceil(expiry / self.tick_seconds))
+            self._count += 1
+
+    def _cascade(self):
+        # 현재 틱이 윗 단계 칸의 시작이면 그 칸을 아래 단계로 다시 배치 (높은 단계부터)
+        if self.current & ((1 << (SLOT_BITS * LEVELS)) - 1) == 0:
+            far, self._far = self._far, []
+            for key, tick in far:
+                self._place(key, tick)
+        for level in range(LEVELS - 1, 0, -1):
+            if self.current & ((1 << (SLOT_BITS * level)) - 1) == 0:
+                index = (self.current >> (SLOT_BITS * level)) & (SLOTS - 1)
+                entries, self._slots[level][index] = self._slots[level][index], []
+                for key, tick in entries:
+                    self._place(key, tick)
+
+    def advance(self, now=None):
+        # now 까지 만료된 키 목록
+        now = time.time() if now is None else now
+        target = int(now // self.tick_seconds)
+        with self._lock:
+            expired, self._due = self._due, []
+            while self.current < target:
+                if self._count == len(expired):
+                    # 남은 항목이 없으면 빈 칸을 하나씩 돌 필요 없이 건너뛴다
+                    self.current = target
+                    break
+                self.current += 1
+                self._cascade()
+                if self._due:
+                    # 윗 단계에서 내려오다 바로 이번 틱에 만료되는 항목
+                    expired.extend(self._due)
+                    self._due = []
+                slot = self._slots[0][self.current & (SLOTS - 1)]
+                if slot:
+                    expired.extend(key for key, _ in slot)
+                    slot.clear()
+            self._count -= len(expired)
+        return expired
+
+    def __len__(self):
+        return self._count
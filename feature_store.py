@@ -0,0 +1,147 @@
+# feature_store.py
+# 카드/사이트/국가별 집계 특징 저장소
+# 거래가 기록될 때마다 O(1) 로 갱신하고, 점수 계산 시점에 O(1) 로 읽는다.
+# transactions_db 를 다시 훑어 집계하지 않는다. 추적하는 카드/사이트 수는 상한이 있어
+# 오래 안 쓰인 키부터 버리므로 메모리도 일정하게 유지된다.
+# 레지스트리에서 하나를 만들어 모든 세션이 같이 쓰므로 갱신/조회는 락 안에서 한다.
+# 위험 모델(risk_model.RiskModel)은 사이트 최근 1시간 결제 수와 국가 비중만 쓴다.
+# 일회용 카드는 결제가 한 번뿐이라 카드별 누적 금액/건수는 점수 시점에 거의 항상 0 이다.
+
+import threading
+import time
+from collections import OrderedDict
+
+# ------------------- 버킷 슬라이딩 윈도우 -------------------
+class SlidingWindow:
+    # bucket_seconds 초짜리 버킷 n_buckets 개로 최근 (bucket_seconds * n_buckets) 초의 건수/합계를 유지
+    # 버킷 링과 누적 합계를 같이 들고 있어, 시간이 흐른 만큼만 오래된 버킷을 비운다 (분할 상환 O(1))
+    __slots__ = ('bucket_seconds', 'counts', 'sums', 'head', 'count', 'total')
+
+    def __init__(self, bucket_seconds, n_buckets):
+        self.bucket_seconds = bucket_seconds
+        self.counts = [0] * n_buckets
+        self.sums = [0.0] * n_buckets
+        self.head = 0           # 가장 최근 버킷의 절대 번호
+        self.count = 0
+        self.total = 0.0
+
+    def _advance(self, bucket):
+        n = len(self.counts)
+        if bucket - self.head >= n:
+            self.counts = [0] * n
+            self.sums = [0.0] * n
+            self.count = 0
+            self.total = 0.0
+        else:
+            for b in range(self.head + 1, bucket + 1):
+                i = b % n
+                self.count -= self.counts[i]
+                self.total -= self.sums[i]
+                self.counts[i] = 0
+                self.sums[i] = 0.0
+        self.head = bucket
+
+    def add(self, timestamp, amount=0.0):
+        bucket = int(timestamp // self.bucket_seconds)
+        if bucket > self.head:
+            self._advance(bucket)
+        elif bucket <= self.head - len(self.counts):
+            return          # 윈도우보다 오래된 기록
+        i = bucket % len(self.counts)
+        self.counts[i] += 1
+        self.sums[i] += amount
+        self.count += 1
+        self.total += amount
+
+    def totals(self, now):
+        # (건수, 합계)
+        bucket = int(now // self.bucket_seconds)
+        if bucket > self.head:
+            self._advance(bucket)
+        return self.count, self.total
+
+# ------------------- 집계 단위 -------------------
+MAX_COUNTRIES_PER_CARD = 8
+OTHER_COUNTRY = '기타'
+
+class _CardStats:
+    __slots__ = ('spend', 'count', 'last_ts', 'countries')
+
+    def __init__(self):
+        self.spend = 0.0
+        self.count = 0
+        self.last_ts = 0.0
+        self.countries = {}
+
+class _LRU(OrderedDict):
+    # 키 수 상한이 있는 dict (가장 오래 안 쓰인 키부터 제거)
+    def __init__(self, max_keys, factory):
+        super().__init__()
+        self.max_keys = max_keys
+        self.factory = factory
+
+    def touch(self, key):
+        value = self.get(key)
+        if value is None:
+            value = self[key] = self.factory()
+            if len(self) > self.max_keys:
+                self.popitem(last=False)
+        else:
+            self.move_to_end(key)
+        return value
+
+# ------------------- 특징 저장소 -------------------
+class FeatureStore:
+    def __init__(self, max_cards=100_000, max_sites=10_000):
+        self.cards = _LRU(max_cards, _CardStats)
+        # 사이트별 최근 1시간 결제 (1분 버킷 60개)
+        self.sites = _LRU(max_sites, lambda: SlidingWindow(60, 60))
+        self.countries = {}
+        self.country_total = 0
+        self._lock = threading.Lock()
+
+    def update(self, card_id, amount, site, country, timestamp=None):
+        # 거래 1건 반영 (원장 기록과 같은 시점에 호출)
+        timestamp = time.time() if timestamp is None else timestamp
+        country = country.upper()
+        with self._lock:
+            self._update(card_id, amount, site, country, timestamp)
+
+    def _update(self, card_id, amount, site, country, timestamp):
+        # 락을 잡은 상태에서 호출
+        card = self.cards.touch(card_id)
+        card.spend += amount
+        card.count += 1
+        card.last_ts = max(card.last_ts, timestamp)
+        if country in card.countries or len(card.countries) < MAX_COUNTRIES_PER_CARD:
+            card.countries[country] = card.countries.get(country, 0) + 1
+        else:
+            card.countries[OTHER_COUNTRY] = card.countries.get(OTHER_COUNTRY, 0) + 1
+
+        self.sites.touch(site).add(timestamp, amount)
+        self.countries[country] = self.countries.get(country, 0) + 1
+        self.country_total += 1
+
+    def lookup(self, card_id, site, country, now=None):
+        # 점수 계산용 특징 (처음 보는 카드/사이트는 0)
+        now = time.time() if now is None else now
+        country = country.upper()
+        with self._lock:
+            return self._lookup(card_id, site, country, now)
+
+    def _lookup(self, card_id, site, country, now):
+        # 락을 잡은 상태에서 호출
+        card = self.cards.get(card_id)
+        window = self.sites.get(site)
+        site_count, site_sum = window.totals(now) if window is not None else (0, 0.0)
+        return {
+            'card_spend': card.spend if card else 0.0,
+            'card_tx_count': card.count if card else 0,
+            'card_seconds_since_last': now - card.last_ts if card and card.count else None,
+            'card_country_share': card.countries.get(country, 0) / card.count if card and card.count else 0.0,
+            'card_country_count': len(card.countries) if card else 0,
+            'site_tx_last_hour': site_count,
+            'site_amount_last_hour': site_sum,
+            'country_share': self.countries.get(country, 0) / self.country_total if self.country_total else 0.0,
+            'country_total': self.country_total,
+        }
@@ -0,0 +1,116 @@
+# history.py
+# 거래 기록 조회: 원장(ledger.Ledger) 위의 보조 색인과 페이지 단위 조회
+# 카드/사이트/국가별 행 번호 목록을 원장이 늘어난 만큼만 갱신하고,
+# 필터 -> 정렬 -> 페이지 자르기를 행 번호 배열로만 처리한 뒤 화면에 보일 행만 레코드로 꺼낸다.
+# 정렬 결과는 (필터, 정렬 기준) 별로 원장 크기가 바뀔 때까지 재사용하므로 페이지를 넘길 때는 다시 정렬하지 않는다.
+# 시간순은 원장 기록 순서(추가 전용)를 그대로 쓴다.
+# 여러 세션이 같은 색인을 공유하므로 갱신은 쓰기 락, 조회는 읽기 락 (조회끼리는 서로 막지 않음).
+
+from array import array
+
+import numpy as np
+
+from ledger import decode_record
+from rwlock import RWLock
+
+SORT_KEYS = {'time': None, 'amount': 'amount', 'risk': 'risk_score'}
+PAGE_SIZE = 50
+MAX_CACHED_ORDERS = 32
+
+_EMPTY = np.empty(0, dtype=np.uint32)
+
+class HistoryIndex:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.size = 0           # 색인에 반영된 원장 행 수
+        self.by_card = {}       # 카드 번호(bytes) -> array('I') 행 번호
+        self.by_site = {}       # 사이트 번호 -> array('I')
+        self.by_country = {}    # 국가 코드(bytes) -> array('I')
+        self._orders = {}       # (필터, 정렬 기준) -> 정렬된 행 번호
+        self._lock = RWLock()
+
+    def refresh(self):
+        # 마지막 갱신 이후 추가된 행만 색인에 반영
+        if len(self.ledger) == self.size:
+            return
+        with self._lock.write():
+            total = len(self.ledger)
+            records = self.ledger.as_array()[self.size:total]
+            for column, index in (('card_id', self.by_card), ('site_id', self.by_site), ('country', self.by_country)):
+                keys, inverse = np.unique(records[column], return_inverse=True)
+                order = np.argsort(inverse, kind='stable')
+                bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+                rows = (order + self.size).astype(np.uint32)
+                for i, key in enumerate(keys.tolist()):
+                    index.setdefault(key, array('I')).frombytes(rows[bounds[i]:bounds[i + 1]].tobytes())
+            self.size = total
+            self._orders.clear()
+
+    def _filtered(self, card_id, site, country):
+        # 필터에 맞는 행 번호 (오름차순), 필터가 없으면 None
+        lists = []
+        if card_id:
+            lists.append(self.by_card.get(card_id.encode('ascii', 'replace'), ()))
+        if site:
+            site_id = self.ledger.find_site(site)
+            lists.append(() if site_id is None else self.by_site.get(site_id, ()))
+        if country:
+            lists.append(self.by_country.get(country.upper().encode('ascii', 'replace'), ()))
+        if not lists:
+            return None
+        # 가장 짧은 목록부터 교집합
+        lists.sort(key=len)
+        # 복사본으로 시작한다 (array 를 가리키는 뷰가 캐시에 남아 있으면 refresh 때 array 를 늘릴 수 없음)
+        rows = np.array(lists[0], dtype=np.uint32)
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, np.frombuffer(other, dtype=np.uint32) if len(other) else _EMPTY,
+                                  assume_unique=True)
+        return rows
+
+    def _order(self, card_id, site, country, sort):
+        key = (card_id, site, country, sort)
+        order = self._orders.get(key)
+        if order is None:
+            rows = self._filtered(card_id, site, country)
+            column = SORT_KEYS[sort]
+            if column is not None:
+                values = self.ledger.as_array()[column][:self.size]
+                if rows is None:
+                    order = np.argsort(values, kind='stable')
+                else:
+                    order = rows[np.argsort(values[rows], kind='stable')]
+            else:
+                order = rows
+            if len(self._orders) >= MAX_CACHED_ORDERS:
+                self._orders.clear()
+            self._orders[key] = order
+        return order
+
+    def count(self, card_id=None, site=None, country=None):
+        self.refresh()
+        with self._lock.read():
+            rows = self._filtered(card_id or None, site or None, country or None)
+            return self.size if rows is None else len(rows)
+
+    def rows(self, card_id=None, site=None, country=None, sort='time', descending=True,
+             page=0, page_size=PAGE_SIZE):
+        # (이번 페이지의 원장 행 번호 목록, 조건에 맞는 전체 건수)
+        self.refresh()
+        with self._lock.read():
+            order = self._order(card_id or None, site or None, country or None, sort)
+            total = self.size if order is None else len(order)
+        start = page * page_size
+        stop = min(start + page_size, total)
+        if start >= stop:
+            return [], total
+        if descending:
+            positions = range(total - 1 - start, total - 1 - stop, -1)
+        else:
+            positions = range(start, stop)
+        return [p if order is None else int(order[p]) for p in positions], total
+
+    def query(self, card_id=None, site=None, country=None, sort='time', descending=True,
+              page=0, page_size=PAGE_SIZE):
+        # (이번 페이지 행 dict 목록, 조건에 맞는 전체 건수)
+        rows, total = self.rows(card_id, site, country, sort, descending, page, page_size)
+        return [decode_record(self.ledger.record(i), self.ledger) for i in rows], total
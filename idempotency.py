@@ -0,0 +1,98 @@
+# idempotency.py
+# 결제 요청 멱등 키 저장소
+# 같은 멱등 키로 다시 들어온 결제는 위험 점수 계산/원장 기록 없이 처음 결정을 그대로 돌려준다.
+# Streamlit rerun, 버튼 중복 클릭, 재시도로 같은 결제가 두 번 기록되는 것을 막는다.
+# 처음 요청이 결정을 계산하는 동안 키를 점유해 두므로, 동시에 들어온 같은 키의 요청도 그 결정을 기다려 받는다.
+# 키 수 상한(LRU)과 보관 시간(TTL)이 있어 메모리는 일정하게 유지된다.
+
+import threading
+import time
+from collections import OrderedDict
+
+IDEMPOTENCY_TTL = 600
+MAX_KEYS = 100_000
+
+class _InFlight:
+    # 결정을 계산 중인 키의 자리표. 같은 키로 들어온 요청은 event 가 설정될 때까지 기다린다
+    __slots__ = ('event', 'decision')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.decision = None    # 계산이 예외로 끝났으면 None
+
+class IdempotencyCache:
+    def __init__(self, max_keys=MAX_KEYS, ttl=IDEMPOTENCY_TTL):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries = OrderedDict()   # 키 -> (결정 또는 _InFlight, 저장 시각), 저장 순서 (앞쪽이 가장 오래됨)
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        # 앞에서부터 보관 시간이 지난 키만 제거 (분할 상환 O(1))
+        while self._entries:
+            key, (_, stored_at) = next(iter(self._entries.items()))
+            if now - stored_at < self.ttl:
+                break
+            del self._entries[key]
+
+    def get(self, key, now=None):
+        # 저장된 결정 (없으면 None). 계산 중인 키면 끝날 때까지 기다린다
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value = entry[0]
+        if isinstance(value, _InFlight):
+            value.event.wait()
+            return value.decision
+        return value
+
+    def run(self, key, compute, now=None):
+        # 키의 결정을 돌려준다. 처음 들어온 요청만 락 안에서 키를 점유하고 compute() 를 실행하며,
+        # 동시에 들어온 같은 키의 요청은 점유한 쪽의 결과를 기다려 그대로 받는다 (결정은 한 번만 계산)
+        now = time.time() if now is None else now
+        while True:
+            with self._lock:
+                self._expire(now)
+                entry = self._entries.get(key)
+                if entry is None:
+                    claim = _InFlight()
+                    self._entries[key] = (claim, now)
+                    if len(self._entries) > self.max_keys:
+                        self._entries.popitem(last=False)
+                    break
+            value = entry[0]
+            if not isinstance(value, _InFlight):
+                return value
+            value.event.wait()
+            if value.decision is not None:
+                return value.decision
+            # 점유한 쪽이 실패했으면 (자리표는 지워졌으므로) 다시 점유를 시도한다
+        try:
+            decision = compute()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key, (None,))[0] is claim:
+                    del self._entries[key]
+            claim.event.set()
+            raise
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is claim:
+                self._entries[key] = (decision, entry[1])
+        claim.decision = decision
+        claim.event.set()
+        return decision
+
+    def discard(self, key):
+        # 키를 지운다 (취소/만료된 결제를 같은 키로 다시 요청하면 처음부터 다시 결정)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,152 @@
+# ledger.py
+# 추가 전용(append-only) 바이너리 거래 원장
+# 거래 한 건 = 고정 길이 레코드 1개(RECORD_SIZE 바이트), write() 한 번으로 추가하고
+# 읽을 때는 mmap 위에서 struct 로 바로 꺼내므로 행마다 dict 를 만들지 않는다.
+#
+# 레코드 구조 (little-endian, 40 bytes)
+#   timestamp    d   8  결제 시각 (epoch 초)
+#   card_id      16s 16 카드 번호 (ASCII, 뒤쪽 NUL 패딩)
+#   amount       I   4  결제 금액
+#   site_id      I   4  사이트 번호 (<path>.sites 파일의 줄 번호)
+#   risk_score   f   4  위험 점수
+#   country      2s  2  국가 코드
+#   reason_mask  H   2  위험 요소 비트마스크
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+RECORD = struct.Struct('<d16sIIf2sH')
+RECORD_SIZE = RECORD.size
+
+# numpy 를 쓰는 쪽(as_array)에서 사용하는 같은 레이아웃의 dtype 정의
+NUMPY_FIELDS = [
+    ('timestamp', '<f8'),
+    ('card_id', 'S16'),
+    ('amount', '<u4'),
+    ('site_id', '<u4'),
+    ('risk_score', '<f4'),
+    ('country', 'S2'),
+    ('reason_mask', '<u2'),
+]
+
+class Ledger:
+    def __init__(self, path="ledger.bin"):
+        self.path = path
+        self.sites_path = path + ".sites"
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._mm = None
+        self._mm_size = 0
+        self._sites = []
+        self._site_ids = {}
+        self._load_sites()
+
+    # ------------------- 사이트 번호 -------------------
+    def _load_sites(self):
+        if not os.path.exists(self.sites_path):
+            return
+        with open(self.sites_path, encoding='utf-8') as f:
+            for line in f.read().split('\n')[len(self._sites):]:
+                if line:
+                    self._site_ids[line] = len(self._sites)
+                    self._sites.append(line)
+
+    def site_id(self, site):
+        site_id = self._site_ids.get(site)
+        if site_id is not None:
+            return site_id
+        # 다른 프로세스가 먼저 추가했을 수 있으므로 잠금 후 다시 읽고 추가
+        with open(self.sites_path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._load_sites()
+                if site not in self._site_ids:
+                    f.write(site + '\n')
+                    f.flush()
+                    self._site_ids[site] = len(self._sites)
+                    self._sites.append(site)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return self._site_ids[site]
+
+    def find_site(self, site):
+        # 등록된 사이트 번호, 없으면 None (조회용: 새 번호를 만들지 않음)
+        if site not in self._site_ids:
+            self._load_sites()
+        return self._site_ids.get(site)
+
+    def site_name(self, site_id):
+        if site_id >= len(self._sites):
+            self._load_sites()
+        return self._sites[site_id]
+
+    # ------------------- 쓰기 -------------------
+    def pack(self, card_id, amount, site, country, risk_score, reason_mask=0, timestamp=None):
+        # 레코드 바이트만 만든다 (인코딩 오류는 여기서 나므로, 쓰기 전에 미리 만들어 둘 수 있다)
+        return RECORD.pack(
+            time.time() if timestamp is None else timestamp,
+            card_id.encode('ascii'),
+            int(amount),
+            self.site_id(site),
+            risk_score,
+            country.upper().encode('ascii')[:2],
+            reason_mask,
+        )
+
+    def write(self, record):
+        os.write(self._fd, record)
+
+    def append(self, card_id, amount, site, country, risk_score, reason_mask=0, timestamp=None):
+        self.write(self.pack(card_id, amount, site, country, risk_score, reason_mask, timestamp))
+
+    # ------------------- 읽기 -------------------
+    def __len__(self):
+        return os.fstat(self._fd).st_size // RECORD_SIZE
+
+    def _buffer(self):
+        size = len(self) * RECORD_SIZE
+        if size != self._mm_size:
+            # 이전 mmap 은 as_array() 가 돌려준 배열이 참조 중일 수 있으므로 닫지 않고 GC 에 맡긴다
+            self._mm = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ) if size else None
+            self._mm_size = size
+        return self._mm
+
+    def record(self, index):
+        if index < 0:
+            index += len(self)
+        return RECORD.unpack_from(self._buffer(), index * RECORD_SIZE)
+
+    def iter_records(self, start=0, stop=None):
+        mm = self._buffer()
+        if mm is None:
+            return iter(())
+        stop = len(self) if stop is None else min(stop, len(self))
+        return RECORD.iter_unpack(memoryview(mm)[start * RECORD_SIZE:stop * RECORD_SIZE])
+
+    def as_array(self):
+        # mmap 을 복사 없이 numpy 구조체 배열로 본다 (컬럼 단위 집계용)
+        import numpy as np
+
+        mm = self._buffer()
+        dtype = np.dtype(NUMPY_FIELDS)
+        if mm is None:
+            return np.empty(0, dtype=dtype)
+        return np.frombuffer(mm, dtype=dtype)
+
+    def close(self):
+        self._mm = None
+        os.close(self._fd)
+
+def decode_record(record, ledger):
+    timestamp, card_id, amount, site_id, risk_score, country, reason_mask = record
+    return {
+        'timestamp': timestamp,
+        'card_id': card_id.rstrip(b'\0').decode('ascii'),
+        'amount': amount,
+        'site': ledger.site_name(site_id),
+        'country': country.decode('ascii'),
+        'risk_score': round(risk_score, 2),
+        'reason_mask': reason_mask,
+    }
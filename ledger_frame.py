@@ -0,0 +1,84 @@
+# ledger_frame.py
+# 원장(ledger.Ledger)을 Arrow 컬럼 테이블로 보는 증분 프레임
+# 원장에 추가된 행만 RecordBatch 하나로 바꿔 붙이고, version(반영된 행 수)을 올린다.
+# 추가 전용 원장이라 (원장 경로, version) 이 같으면 내용도 같으므로 st.cache_data 캐시 키로 쓸 수 있다.
+# 문자열 컬럼(카드 번호, 사이트, 국가, 위험 요소)은 배치마다 고유값만 디코딩하는 사전(dictionary) 인코딩이다.
+# pyarrow 는 Streamlit 의존성이라 앱 환경에는 항상 설치되어 있다.
+
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from card_engine import decode_reasons
+from rwlock import RWLock
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),      # 현지 시각 (risk_model.local_hours 와 같은 기준)
+    ('card_id', _DICT),
+    ('amount', pa.uint32()),
+    ('site', _DICT),
+    ('country', _DICT),
+    ('risk_score', pa.float32()),
+    ('reasons', _DICT),
+])
+MAX_BATCHES = 64        # 작은 배치가 이만큼 쌓이면 하나로 합친다
+
+def _dictionary(values, decode):
+    # 고유값만 decode 해서 사전 인코딩 배열로
+    keys, inverse = np.unique(values, return_inverse=True)
+    return pa.DictionaryArray.from_arrays(
+        pa.array(inverse.astype(np.int32)),
+        pa.array([decode(key) for key in keys.tolist()], type=pa.string()),
+    )
+
+class LedgerFrame:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.version = 0        # 프레임에 반영된 원장 행 수
+        self._batches = []
+        self._table = None
+        self._lock = RWLock()      # 여러 세션이 공유: 갱신은 쓰기 락, 테이블 조회는 읽기 락
+
+    def _batch(self, records):
+        local = (records['timestamp'] - time.timezone) * 1_000_000
+        return pa.RecordBatch.from_arrays([
+            pa.array(local.astype(np.int64), type=pa.timestamp('us')),
+            _dictionary(records['card_id'], lambda b: b.decode('ascii')),
+            pa.array(np.ascontiguousarray(records['amount'])),
+            _dictionary(records['site_id'], self.ledger.site_name),
+            _dictionary(records['country'], lambda b: b.decode('ascii')),
+            pa.array(np.ascontiguousarray(records['risk_score'])),
+            _dictionary(records['reason_mask'], lambda mask: ', '.join(decode_reasons(mask))),
+        ], schema=SCHEMA)
+
+    def refresh(self):
+        # 마지막 갱신 이후 추가된 행만 변환해서 붙인다
+        if len(self.ledger) == self.version:
+            return self.version
+        with self._lock.write():
+            total = len(self.ledger)
+            if total > self.version:
+                self._batches.append(self._batch(self.ledger.as_array()[self.version:total]))
+                if len(self._batches) > MAX_BATCHES:
+                    table = pa.Table.from_batches(self._batches, schema=SCHEMA)
+                    self._batches = table.unify_dictionaries().combine_chunks().to_batches()
+                self.version = total
+                self._table = None
+            return self.version
+
+    def table(self):
+        self.refresh()
+        with self._lock.read():
+            table = self._table
+            if table is None:
+                table = self._table = pa.Table.from_batches(self._batches, schema=SCHEMA)
+            return table
+
+    def take(self, rows):
+        # 행 번호 목록의 행만 (history.HistoryIndex 의 조회 결과와 함께 사용)
+        return self.table().take(pa.array(rows, type=pa.int64()))
+
+    def __len__(self):
+        return self.version
@@ -0,0 +1,247 @@
+# models.py
+# __slots__ 기반 Card / Transaction 타입과 array 컬럼 기반 대량 보관용 CardTable / TxTable
+# dict 카드 한 장은 수백 바이트를 쓰지만, 테이블에서는 카드 한 장이 컬럼마다 몇 바이트씩만 차지한다.
+# Card 는 card['limit'], card.get('allowed_sites') 처럼 dict 처럼도 읽을 수 있어 기존 코드와 호환된다.
+
+from array import array
+from datetime import datetime
+
+from card_store import StripedReservations
+from site_policy import policies
+
+# ------------------- 단건 타입 -------------------
+class Card:
+    __slots__ = ('card_id', 'purpose', 'limit', 'expiry', 'restricted', 'allowed_sites', 'active')
+
+    def __init__(self, card_id, purpose, limit, expiry, restricted=False, allowed_sites=None, active=True):
+        self.card_id = card_id
+        self.purpose = purpose
+        self.limit = limit
+        self.expiry = expiry
+        self.restricted = restricted
+        self.allowed_sites = allowed_sites
+        self.active = active
+
+    @classmethod
+    def from_dict(cls, card_id, card):
+        return cls(card_id, card['purpose'], card['limit'], card['expiry'],
+                   card['restricted'], card.get('allowed_sites'), card.get('active', True))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'card_id'}
+
+    # dict 카드를 읽던 코드(card['limit'] 등) 호환용
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __repr__(self):
+        return f"Card({self.card_id!r}, limit={self.limit}, active={self.active})"
+
+class Transaction:
+    __slots__ = ('card_id', 'amount', 'site', 'country', 'risk_score', 'reason_mask', 'timestamp')
+
+    def __init__(self, card_id, amount, site, country, risk_score, reason_mask=0, timestamp=0.0):
+        self.card_id = card_id
+        self.amount = amount
+        self.site = site
+        self.country = country
+        self.risk_score = risk_score
+        self.reason_mask = reason_mask
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"Transaction({self.card_id!r}, amount={self.amount}, site={self.site!r})"
+
+def normalize_country(country):
+    # 입력한 국가 -> 영문 대문자 2글자 코드 (예: ' kr ' -> 'KR'), 올바른 코드가 아니면 None
+    code = country.strip().upper()
+    return code if len(code) == 2 and code.isascii() and code.isalpha() else None
+
+def encode_country(country):
+    # 2글자 국가 코드를 uint16 하나로 (올바른 코드가 아니면 빈 코드)
+    code = (normalize_country(country) or '').encode('ascii').ljust(2, b' ')
+    return (code[0] << 8) | code[1]
+
+def decode_country(code):
+    return bytes(((code >> 8) & 0xFF, code & 0xFF)).decode('ascii').strip()
+
+class _Interner:
+    # 반복되는 값(목적, 사이트명)을 번호 하나로 저장
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+# ------------------- 카드 테이블 -------------------
+class CardTable:
+    # 카드 저장소(card_store)와 같은 API(add / get / set_active / reserve / commit / card_ids)를 제공한다
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+        self.limit = array('l')
+        self.expiry = array('d')
+        self.restricted = array('b')
+        self.active = array('b')
+        self.purpose_id = array('I')
+        self.policy_id = array('i')     # site_policy.policies 정책 번호, -1 = 사용처 제한 없음
+        self._purposes = _Interner()
+        self._next_seq = 0
+        self._reservations = StripedReservations()
+
+    def add(self, card_id, card):
+        if card_id in self.index:
+            raise KeyError(f"이미 존재하는 카드입니다: {card_id}")
+        allowed = card.get('allowed_sites')
+        self.index[card_id] = len(self.ids)
+        self.ids.append(card_id)
+        self.limit.append(int(card['limit']))
+        self.expiry.append(card['expiry'].timestamp())
+        self.restricted.append(int(bool(card['restricted'])))
+        self.active.append(int(bool(card.get('active', True))))
+        self.purpose_id.append(self._purposes.intern(card['purpose']))
+        self.policy_id.append(policies.intern(allowed) if allowed else -1)
+
+    def add_many(self, items):
+        for card_id, card in items:
+            self.add(card_id, card)
+
+    def reserve_ids(self, count):
+        start = self._next_seq
+        self._next_seq += count
+        return start
+
+    def row(self, card_id):
+        return self.index.get(card_id)
+
+    def get(self, card_id):
+        row = self.index.get(card_id)
+        if row is None:
+            return None
+        policy = self.policy_id[row]
+        return Card(
+            card_id,
+            self._purposes.values[self.purpose_id[row]],
+            self.limit[row],
+            datetime.fromtimestamp(self.expiry[row]),
+            bool(self.restricted[row]),
+            policies.trie(policy) if policy >= 0 else None,
+            bool(self.active[row]),
+        )
+
+    def set_active(self, card_id, active):
+        self.active[self.index[card_id]] = int(bool(active))
+
+    def retire(self, card_ids):
+        for card_id in card_ids:
+            self.active[self.index[card_id]] = 0
+
+    def active_expiries(self):
+        return [(card_id, expiry) for card_id, expiry, active in zip(self.ids, self.expiry, self.active) if active]
+
+    def _usage(self, card_id):
+        # 점유 판단에 필요한 열만 (Card 객체를 만들지 않음)
+        row = self.index.get(card_id)
+        return None if row is None else {'active': self.active[row], 'limit': self.limit[row]}
+
+    def reserve(self, card_id, amount):
+        return self._reservations.reserve(card_id, amount, self._usage)
+
+    def commit(self, card_id, token):
+        return self._reservations.finish(card_id, token, lambda card_id: self.set_active(card_id, False),
+                                         self._usage)
+
+    def release(self, card_id, token):
+        return self._reservations.finish(card_id, token)
+
+    def card_ids(self, active_only=False):
+        if active_only:
+            return [card_id for card_id, active in zip(self.ids, self.active) if active]
+        return list(self.ids)
+
+    def policy(self, policy_id):
+        return policies.trie(policy_id)
+
+    def __contains__(self, card_id):
+        return card_id in self.index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column_nbytes(self):
+        # 컬럼 배열이 차지하는 바이트 수 (카드 번호 문자열과 색인 dict 제외)
+        columns = (self.limit, self.expiry, self.restricted, self.active, self.purpose_id, self.policy_id)
+        return sum(col.itemsize * len(col) for col in columns)
+
+    def as_numpy(self):
+        # array 버퍼를 복사 없이 numpy 배열로 노출 (일괄 처리용)
+        # 돌려준 배열이 살아 있는 동안에는 array 가 버퍼를 내보내는 중이라 add() 가 BufferError 를 낸다
+        import numpy as np
+
+        return {
+            'limit': np.frombuffer(self.limit, dtype=np.dtype(self.limit.typecode)),
+            'expiry': np.frombuffer(self.expiry, dtype=np.float64),
+            'restricted': np.frombuffer(self.restricted, dtype=np.int8),
+            'active': np.frombuffer(self.active, dtype=np.int8),
+            'purpose_id': np.frombuffer(self.purpose_id, dtype=np.dtype(self.purpose_id.typecode)),
+            'policy_id': np.frombuffer(self.policy_id, dtype=np.dtype(self.policy_id.typecode)),
+        }
+
+# ------------------- 거래 테이블 -------------------
+class TxTable:
+    def __init__(self, cards):
+        self.cards = cards                # CardTable (card_row 로 카드 번호를 찾는다)
+        self.card_row = array('I')
+        self.amount = array('I')
+        self.site_id = array('I')
+        self.country = array('H')
+        self.risk_score = array('f')
+        self.reason_mask = array('H')
+        self.timestamp = array('d')
+        self._sites = _Interner()
+
+    def append(self, tx):
+        self.card_row.append(self.cards.row(tx.card_id))
+        self.amount.append(int(tx.amount))
+        self.site_id.append(self._sites.intern(tx.site))
+        self.country.append(encode_country(tx.country))
+        self.risk_score.append(tx.risk_score)
+        self.reason_mask.append(tx.reason_mask)
+        self.timestamp.append(tx.timestamp)
+
+    def __getitem__(self, i):
+        return Transaction(
+            self.cards.ids[self.card_row[i]],
+            self.amount[i],
+            self._sites.values[self.site_id[i]],
+            decode_country(self.country[i]),
+            self.risk_score[i],
+            self.reason_mask[i],
+            self.timestamp[i],
+        )
+
+    def __len__(self):
+        return len(self.amount)
+
+    def column_nbytes(self):
+        columns = (self.card_row, self.amount, self.site_id, self.country,
+                   self.risk_score, self.reason_mask, self.timestamp)
+        return sum(col.itemsize * len(col) for col in columns)
+
+    def as_numpy(self):
+        import numpy as np
+
+        names = ('card_row', 'amount', 'site_id', 'country', 'risk_score', 'reason_mask', 'timestamp')
+        return {name: np.frombuffer(getattr(self, name), dtype=np.dtype(getattr(self, name).typecode))
+                for name in names}
@@ -0,0 +1,78 @@
+# pending.py
+# 본인인증 대기 결제 저장소
+# 결제 번호(payment_id)로 보류 결제를 여러 건 동시에 보관하고, 인증/취소는 O(1) 로 꺼낸다.
+# 대기 시간이 지난 결제는 만료 시각 힙에서 앞쪽만 확인해 정리한다 (sweep).
+
+import heapq
+import threading
+import time
+import uuid
+
+# 본인인증 대기 시간(초). card_store.RESERVATION_TTL 보다 짧아야 만료 전에 점유가 풀리지 않는다
+PENDING_TIMEOUT = 300
+
+class PendingPayments:
+    def __init__(self, timeout=PENDING_TIMEOUT):
+        self.timeout = timeout
+        self._items = {}        # payment_id -> (decision, expires_at)
+        self._expiry = []       # (expires_at, payment_id) 힙, 이미 처리된 항목은 sweep 때 건너뜀
+        self._lock = threading.Lock()
+
+    def add(self, decision, payment_id=None, now=None):
+        # payment_id 를 주면 (예: 결제 요청의 멱등 키) 이미 있는 결제는 다시 넣지 않는다
+        now = time.time() if now is None else now
+        payment_id = payment_id or uuid.uuid4().hex[:12]
+        expires_at = now + self.timeout
+        with self._lock:
+            if payment_id in self._items:
+                return payment_id
+            self._items[payment_id] = (decision, expires_at)
+            heapq.heappush(self._expiry, (expires_at, payment_id))
+        return payment_id
+
+    def get(self, payment_id, now=None):
+        now = time.time() if now is None else now
+        item = self._items.get(payment_id)
+        if item is None or item[1] <= now:
+            return None
+        return item[0]
+
+    def pop(self, payment_id, now=None):
+        # 인증/취소할 결제를 꺼낸다. 없거나 만료됐으면 None (만료분은 sweep 이 정리)
+        now = time.time() if now is None else now
+        with self._lock:
+            item = self._items.get(payment_id)
+            if item is None or item[1] <= now:
+                return None
+            del self._items[payment_id]
+        return item[0]
+
+    def sweep(self, now=None):
+        # 만료된 (payment_id, decision) 을 꺼내 돌려준다 (호출한 쪽에서 카드 점유 해제)
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, payment_id = heapq.heappop(self._expiry)
+                item = self._items.get(payment_id)
+                if item is not None and item[1] == expires_at:
+                    del self._items[payment_id]
+                    expired.append((payment_id, item[0]))
+        return expired
+
+    def items(self, now=None):
+        # 아직 유효한 (payment_id, decision) 목록
+        now = time.time() if now is None else now
+        return [(payment_id, decision) for payment_id, (decision, expires_at) in list(self._items.items())
+                if expires_at > now]
+
+    def drain(self):
+        # 남은 (payment_id, decision) 을 모두 꺼낸다 (세션 정리 시 카드 점유 해제용)
+        with self._lock:
+            items = [(payment_id, decision) for payment_id, (decision, _) in self._items.items()]
+            self._items.clear()
+            self._expiry.clear()
+        return items
+
+    def __len__(self):
+        return len(self._items)
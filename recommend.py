@@ -0,0 +1,138 @@
+# recommend.py
+# 거래 목적별 카드 발급 조건 추천 (ai_recommend)
+# 목적마다 결제 금액 분포(로그 구간 히스토그램), 위험 결제 비율, 발급 유효 기간/사용처 제한 분포를
+# 거래가 생길 때마다 O(1) 로 갱신하고, 추천은 그 집계에서 계산한다.
+#   한도: 결제 금액 90% 분위수 + 여유 10%, 10 단위 올림
+#   유효 기간: 발급 유효 기간 중앙값 (위험 결제 비율이 높으면 최대 3일)
+#   사용처 제한: 위험 결제 비율이 높거나 같은 목적 카드 절반 이상이 제한을 걸었으면 제한
+# 목적별 추천 결과는 ttl 초 동안 재사용하므로 화면을 다시 그릴 때는 O(1) 이다.
+# 표본이 MIN_SAMPLES 보다 적은 목적은 전체 집계로, 전체도 부족하면 기본값으로 추천한다.
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+RECOMMEND_TTL = 60
+MIN_SAMPLES = 5
+MAX_PURPOSES = 10_000
+RISKY_RATE = 0.2                # 이 비율 이상이 본인인증/고위험이면 위험한 목적으로 본다
+SHORT_DURATION_DAYS = 3
+
+# 금액 히스토그램: 1.15 배씩 커지는 구간 64개 (1 ~ 약 7,700)
+AMOUNT_RATIO = 1.15
+AMOUNT_BUCKETS = 64
+# 유효 기간 히스토그램: 1 ~ 365일
+MAX_DURATION_DAYS = 365
+
+DEFAULT_RECOMMENDATION = {"limit": 100, "duration_days": 7, "restricted_sites": True}
+
+def _amount_bucket(amount):
+    if amount <= 1:
+        return 0
+    return min(int(math.log(amount) / math.log(AMOUNT_RATIO)), AMOUNT_BUCKETS - 1)
+
+def _quantile(counts, total, q):
+    # 히스토그램에서 q 분위수가 속한 구간 번호
+    target = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= target:
+            return i
+    return len(counts) - 1
+
+class PurposeStats:
+    __slots__ = ('amounts', 'attempts', 'risky', 'durations', 'cards', 'restricted')
+
+    def __init__(self):
+        self.amounts = [0] * AMOUNT_BUCKETS
+        self.attempts = 0
+        self.risky = 0
+        self.durations = [0] * (MAX_DURATION_DAYS + 1)
+        self.cards = 0
+        self.restricted = 0
+
+    def add_attempt(self, amount, risky):
+        self.amounts[_amount_bucket(amount)] += 1
+        self.attempts += 1
+        self.risky += bool(risky)
+
+    def add_card(self, duration_days, restricted, count=1):
+        self.durations[min(max(int(duration_days), 1), MAX_DURATION_DAYS)] += count
+        self.cards += count
+        self.restricted += count if restricted else 0
+
+    def recommend(self):
+        risky_rate = self.risky / self.attempts
+        limit = AMOUNT_RATIO ** (_quantile(self.amounts, self.attempts, 0.9) + 1) * 1.1
+        if self.cards:
+            duration = _quantile(self.durations, self.cards, 0.5)
+        else:
+            duration = DEFAULT_RECOMMENDATION['duration_days']
+        if risky_rate >= RISKY_RATE:
+            duration = min(duration, SHORT_DURATION_DAYS)
+        return {
+            "limit": max(10, math.ceil(limit / 10) * 10),
+            "duration_days": duration,
+            "restricted_sites": risky_rate >= RISKY_RATE or self.restricted * 2 >= self.cards > 0,
+            "samples": self.attempts,
+            "risky_rate": round(risky_rate, 2),
+        }
+
+class Recommender:
+    def __init__(self, ttl=RECOMMEND_TTL, max_purposes=MAX_PURPOSES):
+        self.ttl = ttl
+        self.max_purposes = max_purposes
+        self._purposes = OrderedDict()      # 목적 -> PurposeStats, 최근 사용 순서
+        self._all = PurposeStats()
+        self._cache = {}                    # 목적 -> (만료 시각, 추천)
+        self._lock = threading.Lock()
+
+    def _stats(self, purpose):
+        # 락을 잡은 상태에서 호출
+        stats = self._purposes.get(purpose)
+        if stats is None:
+            stats = self._purposes[purpose] = PurposeStats()
+            if len(self._purposes) > self.max_purposes:
+                old, _ = self._purposes.popitem(last=False)
+                self._cache.pop(old, None)
+        else:
+            self._purposes.move_to_end(purpose)
+        return stats
+
+    def record_card(self, purpose, duration_days, restricted, count=1):
+        with self._lock:
+            self._stats(purpose).add_card(duration_days, restricted, count)
+            self._all.add_card(duration_days, restricted, count)
+
+    def record_attempt(self, purpose, amount, risky):
+        # risky: 본인인증이 필요했거나 위험 점수가 승인 기준을 넘은 결제
+        with self._lock:
+            self._stats(purpose).add_attempt(amount, risky)
+            self._all.add_attempt(amount, risky)
+
+    def load_history(self, payments):
+        # 기존 거래 기록으로 결제 집계를 채운다: (목적, 금액, 위험 여부) 목록
+        with self._lock:
+            for purpose, amount, risky in payments:
+                self._stats(purpose).add_attempt(amount, risky)
+                self._all.add_attempt(amount, risky)
+
+    def recommend(self, purpose, now=None):
+        now = time.time() if now is None else now
+        cached = self._cache.get(purpose)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        with self._lock:
+            stats = self._purposes.get(purpose)
+            if stats is not None and stats.attempts >= MIN_SAMPLES:
+                recommendation = dict(stats.recommend(), basis=purpose)
+            elif self._all.attempts >= MIN_SAMPLES:
+                recommendation = dict(self._all.recommend(), basis="전체")
+            else:
+                recommendation = dict(DEFAULT_RECOMMENDATION, samples=0, risky_rate=0.0, basis="기본값")
+            if len(self._cache) >= self.max_purposes:
+                self._cache.clear()
+            self._cache[purpose] = (now + self.ttl, recommendation)
+        return recommendation
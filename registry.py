@@ -0,0 +1,67 @@
+# registry.py
+# 프로세스 공용 카드/거래 레지스트리
+# 카드 저장소, 원장, 조회 색인, 위험 모델, 결제 빈도 제한기, 승인 엔진을 프로세스에 하나만 두고
+# 모든 브라우저 세션이 같이 쓴다 (trial24.py 에서 st.cache_resource 로 한 번만 생성).
+# 본인인증 대기 결제처럼 그 사용자에게만 보이는 상태도 세션 번호별로 여기(sessions)에 두고 유휴 세션은 정리한다.
+#
+# 동시 접근
+#   카드 저장소: 쓰기는 연결 하나 + 락, 조회는 WAL 위 읽기 전용 연결 풀 (조회끼리 막지 않음)
+#   원장: O_APPEND 쓰기 + mmap 읽기
+#   조회 색인 / Arrow 프레임: 갱신은 쓰기 락, 조회는 읽기 락 (rwlock.RWLock)
+#   사용 가능 카드 색인 / 만료 휠 / 결제 빈도 제한기 / 멱등 키 저장소 / 특징 저장소: 각자 락
+
+from card_engine import RISK_APPROVE_THRESHOLD, AuthEngine
+from card_store import CardStore
+from feature_store import FeatureStore
+from history import HistoryIndex
+from ledger import Ledger
+from ledger_frame import LedgerFrame
+from recommend import Recommender
+from risk_model import load_model
+from sessions import SessionStore
+from velocity import VelocityLimiter
+
+# 시작할 때 추천 집계를 채우는 데 쓰는 최근 원장 행 수
+BOOTSTRAP_ROWS = 50_000
+
+class SharedRegistry:
+    def __init__(self, cards_path="cards.db", ledger_path="ledger.bin", model_path=None):
+        self.card_store = CardStore(cards_path)
+        self.ledger = Ledger(ledger_path)
+        self.history = HistoryIndex(self.ledger)
+        self.ledger_frame = LedgerFrame(self.ledger)
+        # model_path 가 없으면 기본 선형 모델
+        self.risk_model = load_model(model_path)
+        self.features = FeatureStore()
+        self.velocity = VelocityLimiter()
+        self.recommender = Recommender()
+        self._load_recommender()
+        self.engine = AuthEngine(self.card_store, ledger=self.ledger, risk_fn=self.risk_model,
+                                 features=self.features, velocity=self.velocity,
+                                 recommender=self.recommender)
+        self.sessions = SessionStore(on_evict=self._release_session)
+
+    def _load_recommender(self):
+        # 원장에는 목적이 없으므로 카드별로 한 번씩 저장소에서 목적을 찾는다
+        # 원장에 남은 결제는 모두 승인된 것이므로 위험 점수가 승인 기준을 넘었으면 본인인증을 거친 결제
+        records = self.ledger.as_array()[-BOOTSTRAP_ROWS:]
+        purposes = {}
+        payments = []
+        for card_id, amount, risk_score in zip(records['card_id'].tolist(), records['amount'].tolist(),
+                                               records['risk_score'].tolist()):
+            purpose = purposes.get(card_id)
+            if purpose is None:
+                card = self.card_store.get(card_id.decode('ascii'))
+                purpose = purposes[card_id] = card['purpose'] if card else ''
+            if purpose:
+                payments.append((purpose, amount, risk_score > RISK_APPROVE_THRESHOLD))
+        self.recommender.load_history(payments)
+
+    def _release_session(self, data):
+        # 정리되는 세션의 본인인증 대기 결제는 취소해서 카드 점유를 푼다
+        for payment_id, decision in data.pending.drain():
+            self.engine.cancel(decision, idempotency_key=payment_id)
+
+    def close(self):
+        self.card_store.close()
+        self.ledger.close()
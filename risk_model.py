@@ -0,0 +1,262 @@
+# risk_model.py
+# 학습된 위험 모델 런타임 (외부 서비스 없이 가중치 파일만 읽어서 NumPy 로 추론)
+# calculate_risk(payment_amount, card, site, country) 와 같은 시그니처로 건별 점수를 내고,
+# score_batch() 로 배열 전체를 한 번에 점수화한다.
+# 위험 요소(reasons)는 같은 점수 계산에서 나온 특징별 기여도 상위 k 개로 정한다 (k 는 점수 구간별 개수).
+#   선형: 기여도 = 가중치 * 특징값
+#   GBDT: 분기마다 (자식 노드 값 - 현재 노드 값)을 분기 특징에 더한다 (Saabas 방식).
+#         따라서 트리의 내부 노드 value 에도 그 노드의 평균 출력값이 들어 있어야 한다.
+# 집계 특징(사이트 최근 1시간 결제 수, 국가 결제 비중)은 feature_store.FeatureStore.lookup() 결과를
+# features= 로 받아 쓴다 (uses_features). 받지 못하면 (일괄 점수 등) 0 으로 둔다.
+#
+# 모델 파일(JSON)
+#   선형(로지스틱): {"type": "linear", "features": [...], "weights": [...], "bias": b}
+#   GBDT:          {"type": "gbdt", "features": [...], "base_score": b,
+#                   "trees": [{"feature": [...], "threshold": [...], "left": [...],
+#                              "right": [...], "value": [...]}, ...]}
+#                  트리 노드는 배열 인덱스로 표현하고 feature == -1 이면 잎(value 사용)
+
+import json
+import math
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from card_engine import HIGH_RISK_COUNTRIES
+from models import encode_country, normalize_country
+from risk import REASONS_LIST, reason_count
+
+SITE_BUCKETS = 16
+HOME_COUNTRY = 'KR'
+NIGHT_HOURS = (0, 6)            # 0시 ~ 6시 = 고위험 시간대
+
+FEATURES = [
+    'amount_ratio',             # 결제 금액 / 카드 한도
+    'near_limit',               # 한도의 70% 초과
+    'log_amount',               # log(1 + 결제 금액)
+    'night',                    # 고위험 시간대
+    'high_risk_country',        # NG, RU
+    'foreign',                  # 국내(KR) 외 결제
+] + [f'site_{i}' for i in range(SITE_BUCKETS)] + [  # 사이트 해시 버킷
+    'site_burst',               # log(1 + 이 사이트의 최근 1시간 결제 수)
+    'rare_country',             # 1 - 전체 결제 중 이 국가 비중 (기록이 없으면 0)
+]
+SITE_BURST = 6 + SITE_BUCKETS
+RARE_COUNTRY = SITE_BURST + 1
+
+# 특징 -> 위험 요소 문구 (같은 문구로 묶인 특징은 기여도를 합산)
+FEATURE_REASONS = [
+    '결제금액이 카드 한도 근접',
+    '결제금액이 카드 한도 근접',
+    '고액 결제',
+    '고위험 시간대 사용',
+    '고위험 국가 결제',
+    '해외 결제',
+] + ['위험 사이트 결제'] * SITE_BUCKETS + [
+    '사이트 결제 급증',
+    '드문 국가 결제',
+]
+
+EXPLAINED_REASONS = list(dict.fromkeys(FEATURE_REASONS))
+_FEATURE_REASON_INDEX = [EXPLAINED_REASONS.index(r) for r in FEATURE_REASONS]
+# (특징 수, 위험 요소 수) 합산 행렬과 위험 요소별 비트 (ledger reason_mask 와 같은 비트)
+_REASON_MATRIX = np.zeros((len(FEATURES), len(EXPLAINED_REASONS)))
+_REASON_MATRIX[np.arange(len(FEATURES)), _FEATURE_REASON_INDEX] = 1.0
+_REASON_BITS = np.array([1 << REASONS_LIST.index(r) for r in EXPLAINED_REASONS], dtype=np.uint16)
+
+def top_reasons(reason_contributions, risk):
+    # [(위험 요소 번호, 기여도)] 에서 양(+)의 기여도 상위 reason_count(risk) 개
+    k = reason_count(risk)
+    if not k:
+        return []
+    # 기여도가 같으면 앞 번호 우선 (일괄 계산의 stable 정렬과 같은 순서)
+    ranked = sorted((-c, i) for i, c in enumerate(reason_contributions) if c > 0)
+    return [EXPLAINED_REASONS[i] for _, i in ranked[:k]]
+
+# 기본 선형 모델 (한도 근접/야간/해외/고위험 국가일수록 점수 상승)
+DEFAULT_MODEL = {
+    "type": "linear",
+    "features": FEATURES,
+    "weights": [1.2, 0.6, 0.15, 0.8, 2.5, 0.5] + [0.0] * SITE_BUCKETS + [0.05, 0.3],
+    "bias": -3.0,
+}
+
+BLOCKED_COUNTRY_CODES = np.array([encode_country(c) for c in HIGH_RISK_COUNTRIES], dtype=np.uint16)
+HOME_COUNTRY_CODE = encode_country(HOME_COUNTRY)
+
+def site_bucket(site):
+    # hash() 는 프로세스마다 달라지므로 crc32 로 고정 버킷
+    return zlib.crc32(site.strip().lower().encode('utf-8')) % SITE_BUCKETS
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def aggregate_features(features):
+    # FeatureStore.lookup() 결과 -> (site_burst, rare_country)
+    if not features:
+        return 0.0, 0.0
+    rare = 1.0 - features['country_share'] if features.get('country_total') else 0.0
+    return math.log1p(features['site_tx_last_hour']), rare
+
+# ------------------- 특징 생성 -------------------
+def build_features(amounts, limits, site_buckets, countries, hours, site_burst=None, rare_country=None):
+    # 모든 입력은 같은 길이의 배열, countries 는 models.encode_country 로 인코딩한 uint16
+    # site_burst / rare_country 는 aggregate_features() 값 (없으면 0)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    limits = np.asarray(limits, dtype=np.float64)
+    hours = np.asarray(hours)
+    n = len(amounts)
+
+    X = np.zeros((n, len(FEATURES)), dtype=np.float64)
+    X[:, 0] = amounts / np.maximum(limits, 1.0)
+    X[:, 1] = X[:, 0] > 0.7
+    X[:, 2] = np.log1p(amounts)
+    X[:, 3] = (hours >= NIGHT_HOURS[0]) & (hours < NIGHT_HOURS[1])
+    X[:, 4] = np.isin(countries, BLOCKED_COUNTRY_CODES)
+    X[:, 5] = np.asarray(countries) != HOME_COUNTRY_CODE
+    X[np.arange(n), 6 + np.asarray(site_buckets, dtype=np.intp)] = 1.0
+    if site_burst is not None:
+        X[:, SITE_BURST] = site_burst
+    if rare_country is not None:
+        X[:, RARE_COUNTRY] = rare_country
+    return X
+
+def local_hours(timestamps):
+    # epoch 초 -> 현지 시각(시)
+    return ((np.asarray(timestamps, dtype=np.float64) - time.timezone) // 3600 % 24).astype(np.int64)
+
+# ------------------- 모델 -------------------
+class RiskModel:
+    # 엔진이 FeatureStore.lookup() 결과를 features= 로 넘겨 준다
+    uses_features = True
+
+    def __init__(self, spec=DEFAULT_MODEL):
+        features = list(spec['features'])
+        # 집계 특징을 추가하기 전의 모델 파일(앞부분이 같은 특징 목록)은 나머지 가중치를 0 으로 읽는다
+        if features != FEATURES[:len(features)]:
+            raise ValueError("모델 특징 목록이 현재 특징 생성 코드와 다릅니다.")
+        self.spec = spec
+        self.kind = spec['type']
+        if self.kind == 'linear':
+            weights = list(spec['weights']) + [0.0] * (len(FEATURES) - len(features))
+            self.weights = np.asarray(weights, dtype=np.float64)
+            self.bias = float(spec['bias'])
+            self._w = [float(w) for w in weights]   # 건별 점수용 (NumPy 호출 비용 회피)
+        elif self.kind == 'gbdt':
+            self.base_score = float(spec['base_score'])
+            self.trees = [
+                {key: np.asarray(tree[key], dtype=np.float64 if key in ('threshold', 'value') else np.int64)
+                 for key in ('feature', 'threshold', 'left', 'right', 'value')}
+                for tree in spec['trees']
+            ]
+        else:
+            raise ValueError(f"지원하지 않는 모델 종류입니다: {self.kind}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.spec, f, ensure_ascii=False, indent=2)
+
+    def _tree_values(self, tree, X, contributions):
+        # 모든 행을 동시에 한 단계씩 내려보낸다 (잎에 도달한 행은 제자리)
+        rows = np.arange(len(X))
+        node = np.zeros(len(X), dtype=np.int64)
+        while True:
+            feature = tree['feature'][node]
+            inner = feature >= 0
+            if not inner.any():
+                return tree['value'][node]
+            split = np.where(inner, feature, 0)
+            go_left = X[rows, split] <= tree['threshold'][node]
+            child = np.where(inner, np.where(go_left, tree['left'][node], tree['right'][node]), node)
+            np.add.at(contributions, (rows[inner], split[inner]),
+                      tree['value'][child[inner]] - tree['value'][node[inner]])
+            node = child
+
+    def margin(self, X):
+        # (margin, 특징별 기여도) 를 한 번의 계산으로
+        if self.kind == 'linear':
+            contributions = X * self.weights
+            return contributions.sum(axis=1) + self.bias, contributions
+        contributions = np.zeros_like(X)
+        margin = self.base_score + sum(self._tree_values(tree, X, contributions) for tree in self.trees)
+        return margin, contributions
+
+    def predict(self, X, explain=False):
+        # explain=True 면 (점수, 위험 요소 비트마스크) 반환
+        margin, contributions = self.margin(X)
+        scores = _sigmoid(margin)
+        if not explain:
+            return scores
+        return scores, self._reason_masks(scores, contributions @ _REASON_MATRIX)
+
+    def _reason_masks(self, scores, reason_contributions):
+        # 행마다 양(+)의 기여도 상위 k 개 위험 요소를 비트마스크로
+        k = np.select([scores <= 0.4, scores <= 0.5, scores <= 0.7], [0, 1, 2], 3)
+        order = np.argsort(-reason_contributions, axis=1, kind='stable')
+        ranked = np.take_along_axis(reason_contributions, order, axis=1)
+        keep = (np.arange(order.shape[1]) < k[:, None]) & (ranked > 0)
+        return np.bitwise_or.reduce(np.where(keep, _REASON_BITS[order], 0), axis=1).astype(np.uint16)
+
+    # ------------------- 일괄 점수 -------------------
+    def score_batch(self, amounts, limits, site_ids, countries, sites, timestamps=None, explain=False):
+        # site_ids: sites 목록의 번호 (batch.encode_payments 와 같은 입력 형식)
+        # explain=True 면 (점수 배열, 위험 요소 비트마스크 배열)
+        buckets = np.array([site_bucket(site) for site in sites], dtype=np.intp)[np.asarray(site_ids)]
+        if timestamps is None:
+            hours = np.full(len(buckets), datetime.now().hour)
+        else:
+            hours = local_hours(timestamps)
+        return self.predict(build_features(amounts, limits, buckets, countries, hours), explain)
+
+    # ------------------- 건별 점수 (calculate_risk 호환) -------------------
+    def __call__(self, payment_amount, card, site, country, features=None):
+        # 엔진 밖에서 바로 부를 때도 국가는 2글자 코드로 (올바르지 않으면 빈 코드 = 해외 취급)
+        country = normalize_country(country) or ''
+        site_burst, rare_country = aggregate_features(features)
+        if self.kind == 'linear':
+            return self._linear_score(payment_amount, card['limit'], site, country, datetime.now().hour,
+                                      site_burst, rare_country)
+        X = build_features([payment_amount], [card['limit']], [site_bucket(site)],
+                           [encode_country(country)], [datetime.now().hour], [site_burst], [rare_country])
+        margin, contributions = self.margin(X)
+        risk = float(_sigmoid(margin[0]))
+        return round(risk, 2), top_reasons((contributions @ _REASON_MATRIX)[0], risk)
+
+    def _linear_score(self, amount, limit, site, country, hour, site_burst=0.0, rare_country=0.0):
+        # build_features 와 같은 특징을 파이썬 스칼라로 계산 (0 이 아닌 특징만)
+        w = self._w
+        ratio = amount / max(limit, 1.0)
+        country = country.upper()
+        active = [(0, ratio), (2, math.log1p(amount)), (6 + site_bucket(site), 1.0)]
+        if ratio > 0.7:
+            active.append((1, 1.0))
+        if NIGHT_HOURS[0] <= hour < NIGHT_HOURS[1]:
+            active.append((3, 1.0))
+        if country in HIGH_RISK_COUNTRIES:
+            active.append((4, 1.0))
+        if country != HOME_COUNTRY:
+            active.append((5, 1.0))
+        if site_burst:
+            active.append((SITE_BURST, site_burst))
+        if rare_country:
+            active.append((RARE_COUNTRY, rare_country))
+
+        margin = self.bias
+        reason_contributions = [0.0] * len(EXPLAINED_REASONS)
+        for i, x in active:
+            c = w[i] * x
+            margin += c
+            reason_contributions[_FEATURE_REASON_INDEX[i]] += c
+        risk = 1.0 / (1.0 + math.exp(-margin))
+        return round(risk, 2), top_reasons(reason_contributions, risk)
+
+def load_model(path=None):
+    # 경로가 없으면 기본 선형 모델
+    return RiskModel.load(path) if path else RiskModel()
@@ -0,0 +1,42 @@
+# rwlock.py
+# 읽기/쓰기 락: 읽는 쪽끼리는 서로 막지 않고, 쓰는 쪽은 혼자 들어간다.
+# 쓰기 대기자가 있으면 새 읽기는 기다리므로 읽기가 많아도 쓰기가 굶지 않는다.
+
+import threading
+from contextlib import contextmanager
+
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
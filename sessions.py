@@ -0,0 +1,111 @@
+# sessions.py
+# 세션별 상태 저장소와 메모리 사용량 집계
+# 세션마다 늘어나는 데이터(본인인증 대기 결제, 허용 사이트 입력, 알림 메시지)는 st.session_state 가 아니라
+# 공용 레지스트리의 SessionStore 에 세션 번호로 보관하고, st.session_state 에는 세션 번호와 위젯 값만 남긴다.
+#   - 세션마다 rerun 때 상태 크기(바이트)를 다시 재서 전체 합계를 유지한다 (total_bytes)
+#   - 마지막 접근 후 idle_ttl 초가 지난 세션은 정리한다 (대기 결제의 카드 점유 해제 포함)
+#     fragment 만 다시 실행될 때도 touch() 로 마지막 접근 시각을 갱신한다
+#   - 전체 합계가 max_total_bytes 를 넘으면 가장 오래 쉰 세션부터 정리한다
+# 세션은 마지막 접근 순서로 정렬해 두므로 정리할 세션은 항상 앞쪽에 있다 (분할 상환 O(1)).
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from pending import PendingPayments
+
+SESSION_IDLE_TTL = 1800
+MAX_TOTAL_BYTES = 64 * 1024 * 1024
+DEFAULT_SITES_INPUT = "amazon.com\nkbstar.com\ntemu.com"
+
+def deep_sizeof(obj, seen=None):
+    # 컨테이너/객체를 따라가며 대략적인 바이트 수 (같은 객체는 한 번만 센다)
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, type) or callable(obj):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deep_sizeof(vars(obj), seen)
+        for name in getattr(type(obj), '__slots__', ()):
+            size += deep_sizeof(getattr(obj, name, None), seen)
+    return size
+
+class SessionData:
+    __slots__ = ('pending', 'sites_input', 'flash', 'last_seen', 'nbytes')
+
+    def __init__(self):
+        self.pending = PendingPayments()    # 결제 번호 -> 본인인증 대기 결제
+        self.sites_input = DEFAULT_SITES_INPUT
+        self.flash = {}                     # 전체 rerun 뒤에 보여줄 메시지 (섹션 -> [(종류, 문구)])
+        self.last_seen = 0.0
+        self.nbytes = 0                     # 마지막으로 잰 세션 상태 크기
+
+class SessionStore:
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, max_total_bytes=MAX_TOTAL_BYTES, on_evict=None):
+        self.idle_ttl = idle_ttl
+        self.max_total_bytes = max_total_bytes
+        self.on_evict = on_evict            # 정리되는 SessionData 를 받는 콜백
+        self.total_bytes = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()      # 세션 번호 -> SessionData, 마지막 접근 순서
+        self._lock = threading.Lock()
+
+    def _evict_front(self):
+        # 락을 잡은 상태에서 호출
+        _, data = self._sessions.popitem(last=False)
+        self.total_bytes -= data.nbytes
+        self.evicted += 1
+        return data
+
+    def get(self, session_id, now=None):
+        # 세션 상태 (처음 보거나 정리된 세션이면 새로 만든다)
+        now = time.time() if now is None else now
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                data = self._sessions[session_id] = SessionData()
+            else:
+                self._sessions.move_to_end(session_id)
+            data.last_seen = now
+        return data
+
+    def touch(self, session_id, now=None):
+        # 마지막 접근 시각만 갱신 (fragment 만 다시 실행될 때, O(1)). 이미 정리된 세션이면 아무것도 하지 않는다
+        now = time.time() if now is None else now
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is not None:
+                self._sessions.move_to_end(session_id)
+                data.last_seen = now
+
+    def account(self, session_id, session_state, now=None):
+        # 이 세션의 크기를 다시 재고(st.session_state 값 + 공용 저장소에 둔 값), 예산/유휴 정리를 한다
+        now = time.time() if now is None else now
+        data = self.get(session_id, now)
+        nbytes = deep_sizeof(session_state) + deep_sizeof(data)
+        evicted = []
+        with self._lock:
+            if self._sessions.get(session_id) is data:
+                self.total_bytes += nbytes - data.nbytes
+                data.nbytes = nbytes
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if oldest is data:
+                    break
+                if now - oldest.last_seen < self.idle_ttl and self.total_bytes <= self.max_total_bytes:
+                    break
+                evicted.append(self._evict_front())
+        if self.on_evict is not None:
+            for old in evicted:
+                self.on_evict(old)
+        return nbytes
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,137 @@
+# site_policy.py
+# 허용 사이트 매칭용 도메인 트라이
+# 도메인을 라벨 단위로 뒤집어(com -> amazon -> www) 트라이에 넣어 두면,
+# 허용 목록 길이와 관계없이 결제 사이트의 라벨 수만큼만 따라가서 판정할 수 있다.
+#
+# 패턴 형식
+#   amazon.com      amazon.com 만 허용 (기존 목록과 같은 정확 일치)
+#   *.amazon.com    하위 도메인만 허용 (www.amazon.com, m.shop.amazon.com / amazon.com 제외)
+#   .amazon.com     amazon.com 과 모든 하위 도메인 허용
+#
+# 같은 허용 목록을 가진 카드들은 PolicyRegistry 로 정규화된 정책 하나(정책 번호 + 트라이)를 공유한다.
+
+import threading
+
+def normalize_host(site):
+    # "https://WWW.Amazon.com:443/path" -> "www.amazon.com"
+    host = site.strip().lower()
+    if '://' in host:
+        host = host.split('://', 1)[1]
+    host = host.split('/', 1)[0].split(':', 1)[0]
+    return host.rstrip('.')
+
+def normalize_pattern(pattern):
+    # 패턴을 정규형 문자열로 ("*.Temu.com." -> "*.temu.com"), 빈 줄은 ''
+    pattern = pattern.strip().lower()
+    prefix = ''
+    if pattern.startswith('*.'):
+        prefix, pattern = '*.', pattern[2:]
+    elif pattern.startswith('.'):
+        prefix, pattern = '.', pattern[1:]
+    host = normalize_host(pattern)
+    return prefix + host if host else ''
+
+class _Node:
+    __slots__ = ('children', 'exact', 'subdomains')
+
+    def __init__(self):
+        self.children = {}
+        self.exact = False        # 이 도메인 자체 허용
+        self.subdomains = False   # 이 도메인의 하위 도메인 허용
+
+class SiteTrie:
+    # allowed_sites 목록 자리에 그대로 넣어 쓸 수 있도록 `site in trie`, 반복, len() 을 지원한다
+    def __init__(self, patterns=()):
+        self._root = _Node()
+        self._patterns = []
+        self.policy_id = None       # PolicyRegistry 에 등록된 공유 트라이면 정책 번호
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        if self.policy_id is not None:
+            raise ValueError("여러 카드가 공유하는 정책 트라이는 수정할 수 없습니다.")
+        pattern = normalize_pattern(pattern)
+        if not pattern:
+            return
+        exact, subdomains = True, False
+        host = pattern
+        if pattern.startswith('*.'):
+            host, exact, subdomains = pattern[2:], False, True
+        elif pattern.startswith('.'):
+            host, subdomains = pattern[1:], True
+        node = self._root
+        for label in reversed(host.split('.')):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _Node()
+            node = child
+        node.exact |= exact
+        node.subdomains |= subdomains
+        self._patterns.append(pattern)
+
+    def matches(self, site):
+        labels = normalize_host(site).split('.')
+        node = self._root
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[i])
+            if node is None:
+                return False
+            if node.subdomains and i > 0:
+                return True
+        return node.exact
+
+    __contains__ = matches
+
+    def __iter__(self):
+        return iter(self._patterns)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __repr__(self):
+        return f"SiteTrie({self._patterns!r})"
+
+# ------------------- 정책 공유(interning) -------------------
+def policy_key(patterns):
+    # 순서/중복/대소문자와 무관한 정책 키
+    return tuple(sorted({p for p in map(normalize_pattern, patterns) if p}))
+
+class PolicyRegistry:
+    def __init__(self):
+        self._ids = {}          # 정책 키 -> 정책 번호
+        self._tries = []        # 정책 번호 -> 공유 SiteTrie
+        self._lock = threading.Lock()
+
+    def intern(self, patterns):
+        # 정책 번호를 돌려준다. 같은 허용 목록은 항상 같은 번호
+        if isinstance(patterns, SiteTrie) and patterns.policy_id is not None:
+            return patterns.policy_id
+        key = policy_key(patterns)
+        policy_id = self._ids.get(key)
+        if policy_id is not None:
+            return policy_id
+        with self._lock:
+            policy_id = self._ids.get(key)
+            if policy_id is None:
+                trie = SiteTrie(key)
+                trie.policy_id = policy_id = len(self._tries)
+                self._tries.append(trie)
+                self._ids[key] = policy_id
+        return policy_id
+
+    def trie(self, policy_id):
+        return self._tries[policy_id]
+
+    def __len__(self):
+        return len(self._tries)
+
+# 프로세스 공용 정책 레지스트리
+policies = PolicyRegistry()
+
+def intern_sites(patterns):
+    # 허용 목록 -> 공유 SiteTrie (빈 목록이면 None)
+    if not patterns:
+        return None
+    trie = policies.trie(policies.intern(patterns))
+    return trie if trie else None
@@ -0,0 +1,7 @@
+# tests/conftest.py
+# 저장소 루트의 모듈(card_engine, card_store ...)을 테스트에서 바로 import 하도록 경로 추가
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
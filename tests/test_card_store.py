@@ -0,0 +1,82 @@
+# tests/test_card_store.py
+# 카드 점유/확정: 같은 카드에 대한 동시 점유와 확정, 폐기된 카드 확정
+
+import threading
+import time
+
+import pytest
+
+from card_engine import APPROVED, DECLINED, PENDING, AuthEngine
+from card_store import CardStore, MemoryCardStore
+from models import CardTable
+
+@pytest.fixture(params=["memory", "table", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryCardStore()
+    elif request.param == "table":
+        yield CardTable()
+    else:
+        store = CardStore(str(tmp_path / "cards.db"))
+        yield store
+        store.close()
+
+def low_risk(payment_amount, card, site, country):
+    return 0.1, []
+
+def test_reserve_racing_commit_on_one_card(store):
+    engine = AuthEngine(store, risk_fn=low_risk)
+    card_id = engine.issue_card("테스트", 100, 7)
+    token = store.reserve(card_id, 10)
+    assert token is not None
+
+    barrier = threading.Barrier(9)
+    stolen = []
+    committed = []
+
+    def reserve():
+        barrier.wait()
+        for _ in range(50):
+            stolen.append(store.reserve(card_id, 10))
+
+    def commit():
+        barrier.wait()
+        committed.append(store.commit(card_id, token))
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)] + [threading.Thread(target=commit)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 점유 중에도, 확정 뒤에도 (일회용 카드 비활성화) 다른 결제는 점유하지 못한다
+    assert committed == [True]
+    assert not any(stolen)
+    assert store.commit(card_id, token) is False
+
+def test_concurrent_payments_approve_once(store):
+    engine = AuthEngine(store, risk_fn=low_risk)
+    card_id = engine.issue_card("테스트", 100, 7)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def pay():
+        barrier.wait()
+        results.append(engine.authorize(card_id, 10, "amazon.com", "KR").status)
+
+    threads = [threading.Thread(target=pay) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(APPROVED) == 1
+    assert len(engine.transactions_db) == 1
+
+def test_pending_payment_on_retired_card_is_not_approved(store):
+    engine = AuthEngine(store, risk_fn=low_risk)
+    card_id = engine.issue_card("테스트", 100, 1)
+    pending = engine.authorize(card_id, 10, "amazon.com", "NG")
+    assert pending.status == PENDING
+
+    engine.expire_cards(time.time() + 2 * 86400)
+    assert engine.confirm(pending).status == DECLINED
+    assert engine.transactions_db == []
@@ -0,0 +1,53 @@
+# tests/test_expiry_wheel.py
+# 타이밍 휠: 단계 경계(칸이 아래 단계로 내려가는 틱)를 지나는 만료
+
+import random
+
+import pytest
+
+from expiry_wheel import LEVELS, SLOT_BITS, TimingWheel
+
+TICK = 60
+
+@pytest.mark.parametrize("level", range(1, LEVELS + 1))
+def test_every_key_expires_on_its_tick_across_cascades(level):
+    # 단계 경계 5틱 앞에서 시작해, 경계를 넘으며 아래 단계로 내려오는 만료를 확인한다
+    # (level == LEVELS 면 _far 에서 다시 배치되는 경계)
+    span = 1 << (SLOT_BITS * level)
+    start = 7 * span - 5
+    rng = random.Random(level)
+    wheel = TimingWheel(tick_seconds=TICK, now=start * TICK)
+    expected = {}
+    for i, tick in enumerate(range(start + 1, start + 140)):
+        key = f"card-{i}"
+        expected[key] = tick
+        wheel.schedule(key, tick * TICK)
+    # 등록 시점에 이미 지난 만료
+    wheel.schedule("past", (start - 3) * TICK)
+    assert len(wheel) == len(expected) + 1
+
+    now = start
+    seen = {}
+    while now < start + 220:
+        previous, now = now, now + rng.choice([1, 1, 2, 3, 7, 13])
+        for key in wheel.advance(now * TICK):
+            assert key not in seen
+            seen[key] = (previous, now)
+    assert len(wheel) == 0
+    assert seen.pop("past")[0] == start
+    # 만료 틱을 처음 지나는 advance 에서 나온다 (더 이르지도, 늦지도 않게)
+    assert seen.keys() == expected.keys()
+    for key, tick in expected.items():
+        previous, now = seen[key]
+        assert previous < tick <= now
+
+def test_far_keys_return_after_a_full_top_level_turn():
+    top = 1 << (SLOT_BITS * LEVELS)
+    start = top - 3
+    wheel = TimingWheel(tick_seconds=TICK, now=start * TICK)
+    wheel.schedule("far", (top + 2) * TICK)
+    wheel.schedule("near", (top - 1) * TICK)
+    assert wheel.advance((top - 1) * TICK) == ["near"]
+    assert wheel.advance((top + 1) * TICK) == []
+    assert wheel.advance((top + 2) * TICK) == ["far"]
+    assert len(wheel) == 0
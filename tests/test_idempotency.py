@@ -0,0 +1,78 @@
+# tests/test_idempotency.py
+# 멱등 키: 같은 키의 동시 요청, 취소 후 재요청
+
+import threading
+
+import pytest
+
+from card_engine import APPROVED, DECLINED, PENDING, AuthEngine
+from card_store import MemoryCardStore
+from idempotency import IdempotencyCache
+
+def low_risk(payment_amount, card, site, country):
+    return 0.1, []
+
+def test_same_key_from_two_threads_gets_one_decision():
+    engine = AuthEngine(MemoryCardStore(), risk_fn=low_risk)
+    for i in range(200):
+        card_id = engine.issue_card("테스트", 100, 7)
+        barrier = threading.Barrier(2)
+        results = []
+
+        def pay():
+            barrier.wait()
+            results.append(engine.authorize(card_id, 10, "amazon.com", "KR", idempotency_key=f"pay-{i}"))
+
+        threads = [threading.Thread(target=pay) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results[0] is results[1]
+        assert results[0].status == APPROVED
+    # 키마다 한 번만 승인/기록
+    assert len(engine.transactions_db) == 200
+
+def test_duplicates_wait_for_the_owner():
+    cache = IdempotencyCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "first"
+
+    owner = threading.Thread(target=cache.run, args=("k", slow))
+    owner.start()
+    started.wait()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.run("k", lambda: "second")))
+    waiter.start()
+    release.set()
+    owner.join()
+    waiter.join()
+    assert results == ["first"]
+    assert calls == [1]
+
+def test_failed_owner_releases_the_key():
+    cache = IdempotencyCache()
+    with pytest.raises(ZeroDivisionError):
+        cache.run("k", lambda: 1 / 0)
+    assert cache.run("k", lambda: "retried") == "retried"
+
+def test_cancel_then_resubmit_with_same_key_reserves_again():
+    engine = AuthEngine(MemoryCardStore(), risk_fn=low_risk)
+    card_id = engine.issue_card("테스트", 100, 7)
+    first = engine.authorize(card_id, 10, "amazon.com", "NG", idempotency_key="pay")
+    assert first.status == PENDING
+
+    assert engine.cancel(first, idempotency_key="pay").status == DECLINED
+    second = engine.authorize(card_id, 10, "amazon.com", "NG", idempotency_key="pay")
+    assert second.status == PENDING
+    assert second.reservation != first.reservation
+    # 취소된 점유로는 확정되지 않고, 새 점유로는 확정된다
+    assert engine.confirm(first).status == DECLINED
+    assert engine.confirm(second).status == APPROVED
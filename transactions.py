@@ -0,0 +1,18 @@
+# transactions.py
+# 정규화된 거래 기록 스키마
+# 거래 행에는 카드 dict 대신 카드 번호만 저장하고, 반복되는 사이트/국가/위험 요소 문자열은
+# sys.intern 으로 한 객체를 공유한다. 행의 크기와 표 렌더링 비용이 카드 정책 크기와 무관해진다.
+
+import sys
+
+TRANSACTION_FIELDS = ('card_id', 'payment_amount', 'site', 'country', 'risk_score', 'reasons')
+
+def make_transaction(card_id, payment_amount, site, country, risk_score, reasons):
+    return {
+        'card_id': card_id,
+        'payment_amount': payment_amount,
+        'site': sys.intern(site),
+        'country': sys.intern(country.upper()),
+        'risk_score': risk_score,
+        'reasons': sys.intern(', '.join(reasons)),
+    }
@@ -3,6 +3,8 @@ import random
 import string
 from datetime import datetime, timedelta
 
+from transactions import make_transaction
+
 st.markdown(
     """<style>
     .stApp {
@@ -132,20 +134,13 @@ if st.session_state.cards_db:
                 st.success("결제 승인 완료.")
                 card['active'] = False
                 st.info("유효 기간이 지나면 자동 폐기됩니다.")
-                st.session_state.transactions_db.append({
-                    'card': card,
-                    'selected_card': selected_card,
-                    'payment_amount': payment_amount,
-                    'site': site,
-                    'country': country,
-                    'risk_score': risk_score,
-                    'reasons': reasons
-                })
+                st.session_state.transactions_db.append(
+                    make_transaction(selected_card, payment_amount, site, country, risk_score, reasons)
+                )
             else:
                 st.warning("위험 점수가 높습니다. 결제를 계속 진행하려면 본인인증이 필요합니다.")
                 st.session_state.pending_payment = {
-                    'card': card,
-                    'selected_card': selected_card,
+                    'card_id': selected_card,
                     'payment_amount': payment_amount,
                     'site': site,
                     'country': country,
@@ -159,9 +154,9 @@ if st.session_state.cards_db:
         if st.button("본인인증", key="auth_button"):
             pending = st.session_state.pending_payment
             st.success(f"결제 승인 완료 (AI 위험 점수: {pending['risk_score']:.2f})")
-            pending['card']['active'] = False
+            st.session_state.cards_db[pending['card_id']]['active'] = False
             st.info("유효 기간이 지나면 자동 폐기됩니다.")
-            st.session_state.transactions_db.append(pending)
+            st.session_state.transactions_db.append(make_transaction(**pending))
             st.session_state.auth_pending = False
             st.session_state.pending_payment = None
 
@@ -1,7 +1,9 @@
 import streamlit as st
-import random
-import string
-from datetime import datetime, timedelta
+import os
+import uuid
+
+from card_engine import APPROVED, PENDING, parse_allowed_sites
+from registry import SharedRegistry
 
 st.markdown(
     """<style>
@@ -18,165 +20,204 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# ------------------- 세션 상태 초기화 -------------------
-if 'cards_db' not in st.session_state:
-    st.session_state.cards_db = {}
-if 'transactions_db' not in st.session_state:
-    st.session_state.transactions_db = []
-if 'custom_allowed_sites_input' not in st.session_state:
-    st.session_state.custom_allowed_sites_input = "amazon.com\nkbstar.com\ntemu.com"
-if 'auth_pending' not in st.session_state:
-    st.session_state.auth_pending = False
-if 'pending_payment' not in st.session_state:
-    st.session_state.pending_payment = None
+# ------------------- 공용 레지스트리 -------------------
+@st.cache_resource
+def get_registry():
+    # 카드 저장소/원장/엔진은 프로세스에 하나, 모든 세션이 공유
+    # VIRTUALCARD_RISK_MODEL 에 모델 파일 경로를 주면 그 모델, 없으면 기본 선형 모델
+    return SharedRegistry("cards.db", "ledger.bin", os.environ.get("VIRTUALCARD_RISK_MODEL"))
+
+registry = get_registry()
+engine = registry.engine
+
+# ------------------- 세션 상태 -------------------
+# st.session_state 에는 세션 번호와 위젯 값만 두고, 세션 데이터는 공용 레지스트리의 세션 저장소에 둔다
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session = registry.sessions.get(st.session_state.session_id)
+pending_payments = session.pending
+# 세션 상태 크기 집계 + 유휴/예산 초과 세션 정리
+session_bytes = registry.sessions.account(st.session_state.session_id, st.session_state.to_dict())
+st.sidebar.caption(f"이 세션 상태: {session_bytes / 1024:,.1f} KB | "
+                   f"전체 세션 {len(registry.sessions)}개: {registry.sessions.total_bytes / 1024:,.1f} KB")
 
 # ------------------- 유틸 함수 -------------------
-def ai_recommend():
-    return {
-        "limit": random.choice([50, 100, 150, 200, 500]),
-        "duration_days": random.choice([1, 3, 7, 14, 30]),
-        "restricted_sites": random.choice([True, False])
-    }
+def ai_recommend(purpose):
+    # 목적별 결제 금액 분위수/위험 결제 비율로 추천 (목적별로 일정 시간 캐시)
+    return registry.recommender.recommend(purpose)
 
-def generate_card_id():
-    num_part = ''.join(random.choices(string.digits, k=3))
-    alpha_part = ''.join(random.choices(string.ascii_uppercase, k=3))
-    return f"CARD{num_part}-{alpha_part}"
-
-def calculate_risk(payment_amount, card, site, country):
-    if site == 'kbstar.com':
-        return 0.0, []
-
-    risk = random.uniform(0.05, 0.6)  # 줄여서 과도한 거절 방지
-    reasons_list = [
-        '결제금액이 카드 한도 근접',
-        '고위험 시간대 사용',
-        '미등록 기기 사용',
-        '고위험 IP 접근',
-        '과거 신고 내역 다수',
-        '거래 패턴 이상 감지'
-    ]
-
-    if payment_amount > 0.7 * card['limit']:
-        risk += 0.05
-
-    risk = min(risk, 1.0)
-
-    if risk <= 0.4:
-        reasons = []
-    elif risk <= 0.5:
-        reasons = random.sample(reasons_list, 1)
-    elif risk <= 0.7:
-        reasons = random.sample(reasons_list, 2)
-    else:
-        reasons = random.sample(reasons_list, 3)
-
-    return round(risk, 2), reasons
+# 전체 rerun 뒤에 보여줄 메시지
+def flash(section, kind, text):
+    session.flash.setdefault(section, []).append((kind, text))
+
+def show_flash(section):
+    for kind, text in session.flash.pop(section, []):
+        getattr(st, kind)(text)
 
 # ------------------- 앱 타이틀 -------------------
 st.title("가상카드 발급 & 결제 시뮬레이션")
 
+# 각 섹션은 fragment 라서 입력/버튼은 자기 섹션만 다시 실행한다.
+# 다른 섹션에 보이는 데이터가 바뀌는 경우(카드 발급, 결제 승인)에만 앱 전체를 다시 실행한다.
+# fragment 만 다시 실행될 때는 위의 세션 집계가 돌지 않으므로 각 섹션이 세션 접근 시각을 직접 갱신한다.
+
 # ------------------- 1. 카드 발급 -------------------
-st.header("1. 카드 발급")
-purpose = st.text_input("거래 목적", "해외 쇼핑")
-amount = st.number_input("결제 한도", min_value=1, max_value=5000, value=100, step=10)
-duration = st.number_input("유효 기간(일)", min_value=1, max_value=365, value=7)
-restrict_sites = st.checkbox("사용처 제한", value=True)
-
-allowed_sites_list = None
-if restrict_sites:
-    st.info("결제를 허용할 사이트를 입력하세요. 한 줄에 하나씩 입력합니다.")
-    st.session_state.custom_allowed_sites_input = st.text_area(
-        "허용 사이트 목록",
-        st.session_state.custom_allowed_sites_input,
-        height=100,
-    )
-    allowed_sites_list = [s.strip() for s in st.session_state.custom_allowed_sites_input.split('\n') if s.strip()]
-
-aI_cond = ai_recommend()
-st.caption(f"AI 추천 조건 예시 → limit: {aI_cond['limit']}, duration_days: {aI_cond['duration_days']}, restricted_sites: {aI_cond['restricted_sites']}")
-
-if st.button("카드 발급"):
-    card_id = generate_card_id()
-    expiry = datetime.now() + timedelta(days=int(duration))
-    st.session_state.cards_db[card_id] = {
-        "purpose": purpose,
-        "limit": int(amount),
-        "expiry": expiry,
-        "restricted": bool(restrict_sites),
-        "allowed_sites": allowed_sites_list if restrict_sites else None,
-        "active": True,
-    }
-    st.success(f"{card_id} 발급 완료! 유효기간: {expiry.strftime('%Y-%m-%d %H:%M:%S')}")
+@st.fragment
+def issue_section():
+    registry.sessions.touch(st.session_state.session_id)
+    st.header("1. 카드 발급")
+    show_flash('issue')
+    with st.form("issue_form"):
+        purpose = st.text_input("거래 목적", "해외 쇼핑")
+        amount = st.number_input("결제 한도", min_value=1, max_value=5000, value=100, step=10)
+        duration = st.number_input("유효 기간(일)", min_value=1, max_value=365, value=7)
+        restrict_sites = st.checkbox("사용처 제한", value=True)
+        st.info("결제를 허용할 사이트를 입력하세요. 한 줄에 하나씩 입력합니다. (*.example.com: 하위 도메인만, .example.com: 도메인과 하위 도메인 모두 허용)")
+        sites_input = st.text_area("허용 사이트 목록", session.sites_input, height=100)
+        submitted = st.form_submit_button("카드 발급")
+
+    aI_cond = ai_recommend(purpose)
+    st.caption(f"AI 추천 조건 예시 → limit: {aI_cond['limit']}, duration_days: {aI_cond['duration_days']}, restricted_sites: {aI_cond['restricted_sites']}"
+               f" (기준: {aI_cond['basis']}, 결제 {aI_cond['samples']}건, 위험 결제 비율 {aI_cond['risky_rate']:.0%})")
+
+    if submitted:
+        # 허용 사이트 목록은 발급할 때만 해석
+        session.sites_input = sites_input
+        allowed_sites_list = parse_allowed_sites(sites_input) if restrict_sites else None
+        card_id = engine.issue_card(purpose, amount, duration, allowed_sites_list)
+        expiry = engine.store.get(card_id)['expiry']
+        flash('issue', 'success', f"{card_id} 발급 완료! 유효기간: {expiry.strftime('%Y-%m-%d %H:%M:%S')}")
+        # 결제 섹션의 카드 목록을 갱신
+        st.rerun()
 
 # ------------------- 2. 결제 요청 -------------------
-st.header("2. 결제 요청")
-if st.session_state.cards_db:
-    selected_card = st.selectbox("결제에 사용할 카드 선택", options=list(st.session_state.cards_db.keys()))
-    payment_amount = st.number_input("결제 금액", min_value=1, max_value=5000, value=80, step=10, key="pay_amount")
-    site = st.text_input("결제 사이트", "amazon.com", key="pay_site")
-    country = st.text_input("사용 국가", "KR", key="pay_country")
-
-    card = st.session_state.cards_db[selected_card]
-
-    if st.button("결제 시도"):
-        # 1. 카드 한도 초과 체크
-        if payment_amount > card['limit']:
-            st.error("결제 금액이 카드 한도를 초과했습니다. 결제를 보류합니다.")
-        
-        # 2. 사용처 제한 체크 (즉시 거절)
-        elif card['restricted'] and card.get('allowed_sites') and site not in card['allowed_sites']:
-            st.error("사용처 제한 위반! 결제가 거부되었습니다.")
-        
-        # 3. 위험 점수 계산
+# 사용 가능한 카드만, 최근 발급 순으로 PICKER_CARDS 장까지
+PICKER_CARDS = 200
+
+def end_payment(payment_id):
+    # 보류 결제가 인증/취소/만료로 끝나면 다음 제출은 같은 입력이어도 새 멱등 키로 보낸다
+    if st.session_state.get('payment_key') == payment_id:
+        st.session_state.pop('payment_inputs', None)
+
+@st.fragment
+def payment_section():
+    registry.sessions.touch(st.session_state.session_id)
+    st.header("2. 결제 요청")
+    show_flash('payment')
+    # 유효기간이 지난 카드 자동 폐기, 본인인증 대기 시간이 지난 결제는 카드 점유를 풀고 정리
+    engine.expire_cards()
+    for payment_id, expired in pending_payments.sweep():
+        engine.cancel(expired, idempotency_key=payment_id)
+        end_payment(payment_id)
+    card_ids = engine.active.recent(PICKER_CARDS)
+    if not card_ids:
+        st.write("사용 가능한 카드가 없습니다. 카드를 먼저 발급해주세요.")
+        return
+
+    with st.form("payment_form"):
+        selected_card = st.selectbox("결제에 사용할 카드 선택", options=card_ids)
+        payment_amount = st.number_input("결제 금액", min_value=1, max_value=5000, value=80, step=10, key="pay_amount")
+        site = st.text_input("결제 사이트", "amazon.com", key="pay_site")
+        country = st.text_input("사용 국가", "KR", key="pay_country")
+        submitted = st.form_submit_button("결제 시도")
+
+    if submitted:
+        # 결제 요청 멱등 키: 입력이 바뀔 때만 새로 만든다 (같은 요청의 재제출/중복 클릭은 처음 결정을 그대로 받음)
+        payment_inputs = (selected_card, payment_amount, site, country)
+        if st.session_state.get('payment_inputs') != payment_inputs:
+            st.session_state.payment_inputs = payment_inputs
+            st.session_state.payment_key = uuid.uuid4().hex[:12]
+        payment_id = st.session_state.payment_key
+        decision = engine.authorize(selected_card, payment_amount, site, country, idempotency_key=payment_id)
+        if decision.risk_score is not None:
+            risk_line = f"AI 위험 점수: {decision.risk_score:.2f} | 위험 요소: {', '.join(decision.reasons) if decision.reasons else '없음'}"
+            if decision.status != APPROVED:
+                st.info(risk_line)
+
+        if decision.status == APPROVED:
+            # 승인 화면은 전체 rerun 으로 다시 그리므로 위험 점수 줄도 알림 메시지로 넘긴다
+            flash('payment', 'info', risk_line)
+            flash('payment', 'success', f"{decision.card_id} {decision.message}")
+            flash('payment', 'info', "유효 기간이 지나면 자동 폐기됩니다.")
+            # 카드 목록과 거래 기록을 갱신
+            st.rerun()
+        elif decision.status == PENDING:
+            pending_payments.add(decision, payment_id)
+            st.warning(f"{decision.message} (결제 번호: {payment_id})")
         else:
-            risk_score, reasons = calculate_risk(payment_amount, card, site, country)
-            st.info(f"AI 위험 점수: {risk_score:.2f} | 위험 요소: {', '.join(reasons) if reasons else '없음'}")
-
-            if risk_score <= 0.4:
-                st.success("결제 승인 완료.")
-                card['active'] = False
-                st.info("유효 기간이 지나면 자동 폐기됩니다.")
-                st.session_state.transactions_db.append({
-                    'card': card,
-                    'selected_card': selected_card,
-                    'payment_amount': payment_amount,
-                    'site': site,
-                    'country': country,
-                    'risk_score': risk_score,
-                    'reasons': reasons
-                })
-            else:
-                st.warning("위험 점수가 높습니다. 결제를 계속 진행하려면 본인인증이 필요합니다.")
-                st.session_state.pending_payment = {
-                    'card': card,
-                    'selected_card': selected_card,
-                    'payment_amount': payment_amount,
-                    'site': site,
-                    'country': country,
-                    'risk_score': risk_score,
-                    'reasons': reasons
-                }
-                st.session_state.auth_pending = True
+            st.error(decision.message)
 
     # ------------------- 본인인증 -------------------
-    if st.session_state.auth_pending:
-        st.subheader("본인인증 필요")
-        if st.button("본인인증", key="auth_button"):
-            pending = st.session_state.pending_payment
-            st.success(f"결제 승인 완료 (AI 위험 점수: {pending['risk_score']:.2f})")
-            pending['card']['active'] = False
-            st.info("유효 기간이 지나면 자동 폐기됩니다.")
-            st.session_state.transactions_db.append(pending)
-            st.session_state.auth_pending = False
-            st.session_state.pending_payment = None
-
-else:
-    st.write("카드를 먼저 발급해주세요.")
+    waiting = pending_payments.items()
+    if waiting:
+        st.subheader(f"본인인증 필요 ({len(waiting)}건)")
+    for payment_id, decision in waiting:
+        col_info, col_auth, col_cancel = st.columns([3, 1, 1])
+        col_info.write(f"{payment_id} | {decision.card_id} | {decision.amount} | {decision.site} | "
+                       f"AI 위험 점수: {decision.risk_score:.2f}")
+        if col_auth.button("본인인증", key=f"auth_{payment_id}"):
+            decision = pending_payments.pop(payment_id)
+            if decision is None:
+                # 이미 인증한 결제(중복 클릭)면 저장된 결과를 그대로 보여준다
+                result = engine.idempotency.get(f"{payment_id}:confirm")
+            else:
+                result = engine.confirm(decision, idempotency_key=f"{payment_id}:confirm")
+            end_payment(payment_id)
+            if result is None:
+                st.error("본인인증 대기 시간이 지나 결제가 취소되었습니다.")
+                continue
+            if result.status == APPROVED:
+                flash('payment', 'success', f"{payment_id} 결제 승인 완료 (AI 위험 점수: {result.risk_score:.2f})")
+                flash('payment', 'info', "유효 기간이 지나면 자동 폐기됩니다.")
+                st.rerun()
+            else:
+                st.error(result.message)
+        if col_cancel.button("취소", key=f"cancel_{payment_id}"):
+            decision = pending_payments.pop(payment_id)
+            if decision is not None:
+                engine.cancel(decision, idempotency_key=payment_id)
+                flash('payment', 'warning', f"{payment_id} 결제를 취소했습니다.")
+            end_payment(payment_id)
+            st.rerun(scope="fragment")
 
 # ------------------- 3. 거래 기록 -------------------
-st.header("3. 거래 기록 확인")
-if st.session_state.transactions_db:
-    st.table(st.session_state.transactions_db)
-else:
-    st.write("거래 기록이 없습니다.")
+SORT_OPTIONS = {"시간": "time", "금액": "amount", "위험 점수": "risk"}
+
+@st.cache_data(max_entries=64)
+def history_page(_frame, path, version, rows):
+    # 원장 경로와 version(반영된 행 수)이 같으면 같은 내용이므로 변환 결과를 재사용
+    return _frame.take(list(rows)).to_pandas()
+
+@st.fragment
+def history_section():
+    registry.sessions.touch(st.session_state.session_id)
+    st.header("3. 거래 기록 확인")
+    history = registry.history
+    if not len(registry.ledger):
+        st.write("거래 기록이 없습니다.")
+        return
+
+    with st.form("history_form"):
+        col_card, col_site, col_country = st.columns(3)
+        filter_card = col_card.text_input("카드 번호", key="history_card")
+        filter_site = col_site.text_input("사이트", key="history_site")
+        filter_country = col_country.text_input("국가", key="history_country")
+        col_sort, col_desc, col_size = st.columns(3)
+        sort = SORT_OPTIONS[col_sort.selectbox("정렬 기준", list(SORT_OPTIONS), key="history_sort")]
+        descending = col_desc.checkbox("내림차순", value=True, key="history_desc")
+        page_size = col_size.selectbox("페이지당 건수", [20, 50, 100], index=1, key="history_page_size")
+        st.form_submit_button("조회")
+
+    # 화면에 보이는 페이지의 행만 원장에서 꺼낸다
+    total = history.count(filter_card, filter_site, filter_country)
+    pages = max(1, -(-total // page_size))
+    page = st.number_input("페이지", min_value=1, max_value=pages, value=1, key="history_page") - 1
+    rows, total = history.rows(filter_card, filter_site, filter_country, sort, descending, page, page_size)
+    frame = registry.ledger_frame
+    page_frame = history_page(frame, frame.ledger.path, frame.refresh(), tuple(rows))
+    st.caption(f"조건에 맞는 {total}건 중 {page * page_size + 1 if rows else 0}~{page * page_size + len(rows)}건 ({page + 1}/{pages} 페이지)")
+    st.dataframe(page_frame, use_container_width=True)
+
+issue_section()
+payment_section()
+history_section()
@@ -0,0 +1,110 @@
+# velocity.py
+# 카드/사이트/국가별 결제 빈도(velocity) 제한
+# 키마다 1분 / 1시간 / 24시간 슬라이딩 윈도우(feature_store.SlidingWindow)의 건수와 합계를 두고,
+# 승인 경로에서 위험 점수 계산 전에 한도를 확인한다.
+# 키당 메모리는 버킷 수만큼으로 고정이고, 가장 긴 윈도우 동안 쓰이지 않은 키는 자동으로 지운다.
+
+import threading
+import time
+from collections import OrderedDict
+
+from feature_store import SlidingWindow
+
+# 윈도우 이름 -> (버킷 길이(초), 버킷 수)
+WINDOWS = {
+    '1m': (5, 12),
+    '1h': (60, 60),
+    '24h': (3600, 24),
+}
+IDLE_SECONDS = max(size * n for size, n in WINDOWS.values())
+
+# 범위 -> 윈도우 -> (최대 건수, 최대 합계), None 은 제한 없음
+DEFAULT_LIMITS = {
+    'card': {'1m': (3, None), '1h': (10, None), '24h': (30, None)},
+    'site': {'1m': (600, None)},
+    'country': {},
+}
+
+SCOPE_NAMES = {'card': '카드', 'site': '사이트', 'country': '국가'}
+WINDOW_NAMES = {'1m': '1분', '1h': '1시간', '24h': '24시간'}
+
+class _KeyWindows:
+    __slots__ = ('windows', 'last_seen')
+
+    def __init__(self, names):
+        self.windows = {name: SlidingWindow(*WINDOWS[name]) for name in names}
+        self.last_seen = 0.0
+
+class VelocityLimiter:
+    def __init__(self, limits=DEFAULT_LIMITS):
+        self.limits = limits
+        # (범위, 키) -> _KeyWindows, 마지막 사용 순서로 정렬 (앞쪽이 가장 오래 쉰 키)
+        self._keys = OrderedDict()
+        # 여러 세션이 같은 제한기를 공유하므로 확인과 기록을 락 하나로 묶는다
+        self._lock = threading.Lock()
+
+    def _keys_for(self, card_id, site, country):
+        return (('card', card_id), ('site', site), ('country', country.upper()))
+
+    def _expire(self, now):
+        # 가장 긴 윈도우보다 오래 쉰 키 제거 (앞에서부터만 보므로 분할 상환 O(1))
+        while self._keys:
+            key, entry = next(iter(self._keys.items()))
+            if now - entry.last_seen < IDLE_SECONDS:
+                break
+            del self._keys[key]
+
+    def check(self, card_id, site, country, amount, now=None):
+        # 이번 결제를 더하면 넘는 제한이 있으면 (범위, 윈도우), 없으면 None
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._check(card_id, site, country, amount, now)
+
+    def _check(self, card_id, site, country, amount, now):
+        self._expire(now)
+        for scope, key in self._keys_for(card_id, site, country):
+            entry = self._keys.get((scope, key))
+            if entry is None:
+                continue
+            for name, (max_count, max_sum) in self.limits.get(scope, {}).items():
+                count, total = entry.windows[name].totals(now)
+                if max_count is not None and count + 1 > max_count:
+                    return scope, name
+                if max_sum is not None and total + amount > max_sum:
+                    return scope, name
+        return None
+
+    def record(self, card_id, site, country, amount, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._record(card_id, site, country, amount, now)
+
+    def _record(self, card_id, site, country, amount, now):
+        for scope, key in self._keys_for(card_id, site, country):
+            names = self.limits.get(scope)
+            if not names:
+                continue
+            entry = self._keys.get((scope, key))
+            if entry is None:
+                entry = self._keys[(scope, key)] = _KeyWindows(names)
+            else:
+                self._keys.move_to_end((scope, key))
+            entry.last_seen = now
+            for window in entry.windows.values():
+                window.add(now, amount)
+
+    def hit(self, card_id, site, country, amount, now=None):
+        # 제한 안이면 기록하고 None, 넘으면 기록하지 않고 (범위, 윈도우)
+        now = time.time() if now is None else now
+        with self._lock:
+            violation = self._check(card_id, site, country, amount, now)
+            if violation is None:
+                self._record(card_id, site, country, amount, now)
+        return violation
+
+    def __len__(self):
+        return len(self._keys)
+
+def describe(violation):
+    scope, window = violation
+    return f"{SCOPE_NAMES[scope]} {WINDOW_NAMES[window]} 결제 빈도 한도 초과"